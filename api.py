@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service HTTP JSON du moteur RAG
+Expose un RAGEngine partagé aux clients (bornes, mobile) sans passer par Streamlit
+
+Points d'accès :
+- GET  /health       : le processus répond
+- GET  /ready        : le moteur est chargé (503 sinon)
+- POST /query        : {"question", "k", "mode", "filters", "rerank", "mmr", "stream"}
+- POST /search       : {"query", "k", "mode", "filters", "rerank", "mmr"}
+- POST /search_many  : {"questions": [...], ...} ; avec "stream": true (ou Accept:
+                       application/x-ndjson), une ligne JSON par question, au fil des lots
+- GET  /metrics      : métriques au format Prometheus
+
+Connexions persistantes (HTTP/1.1 keep-alive), taille des requêtes bornée et
+nombre d'appels simultanés au moteur limité (503 + Retry-After au-delà de l'attente).
+
+Usage : python api.py [--host 127.0.0.1] [--port 8000] [--max-workers 8]
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Iterator
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.rag import RAGEngine, SEARCH_MODES
+from src.filters import validate_filters
+from src.precompute import ENGINE_OPTIONS, QUERY_OPTIONS
+from src.tracing import get_tracer
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_BATCH = 256
+MAX_K = 50
+STREAM_BATCH = 16
+NDJSON = "application/x-ndjson"
+
+# Options de recherche acceptées dans le corps des requêtes
+SEARCH_OPTIONS = ("k", "mode", "filters", "rerank", "mmr")
+
+
+class ApiError(Exception):
+    """Erreur renvoyée au client avec un code HTTP"""
+
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def parse_options(body: Dict[str, Any], defaults: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Valide les options de recherche d'une requête"""
+    options = dict(defaults or {})
+    options.update({key: body[key] for key in SEARCH_OPTIONS if key in body})
+
+    k = options.get("k", 3)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_K:
+        raise ApiError(400, f"k doit être un entier entre 1 et {MAX_K}")
+    if options.get("mode") is None:
+        # null : mode par défaut du point d'accès (automatique pour /query)
+        options.pop("mode", None)
+    elif options["mode"] not in SEARCH_MODES:
+        raise ApiError(400, f"mode inconnu (disponibles: {', '.join(SEARCH_MODES)})")
+    filters = options.get("filters")
+    if filters is not None:
+        if not isinstance(filters, dict):
+            raise ApiError(400, "filters doit être un objet {champ: valeur(s)}")
+        try:
+            validate_filters(filters)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+    for flag in ("rerank", "mmr"):
+        if not isinstance(options.get(flag, False), bool):
+            raise ApiError(400, f"{flag} doit être un booléen")
+
+    return options
+
+
+def require_text(body: Dict[str, Any], field: str) -> str:
+    """Champ texte obligatoire et non vide"""
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"Champ '{field}' manquant ou vide")
+    return value
+
+
+class PooledHTTPServer(HTTPServer):
+    """Serveur HTTP dont les connexions sont servies par un pool borné de threads"""
+
+    def __init__(self, address, handler, max_connections: int):
+        super().__init__(address, handler)
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="rag-api")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RAGApiServer:
+    """Service HTTP JSON autour d'un RAGEngine partagé
+
+    Chaque connexion occupe un thread du pool (`max_connections`) tant qu'elle
+    reste ouverte (au plus `keepalive_timeout` s d'inactivité). Les appels au
+    moteur sont limités à `max_workers` simultanés : une requête qui attend plus
+    de `queue_timeout` s reçoit 503 avec Retry-After.
+    """
+
+    def __init__(self, engine: RAGEngine, host: str = "127.0.0.1", port: int = 8000,
+                 max_workers: int = 8, max_connections: int = 64, queue_timeout: float = 10.0,
+                 keepalive_timeout: float = 15.0, max_body_bytes: int = MAX_BODY_BYTES,
+                 max_batch: int = MAX_BATCH):
+        self.engine = engine
+        self.max_body_bytes = max_body_bytes
+        self.max_batch = max_batch
+        self.queue_timeout = queue_timeout
+        self.tracer = get_tracer()
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 : connexions persistantes (Content-Length ou chunked sur chaque réponse)
+            protocol_version = "HTTP/1.1"
+            timeout = keepalive_timeout
+            server_version = "RAGTunisie/1.0"
+
+            def do_GET(handler):
+                api._dispatch(handler, "GET")
+
+            def do_POST(handler):
+                api._dispatch(handler, "POST")
+
+            def log_message(handler, format, *args):
+                # Pas de journal par requête (voir /metrics et les traces)
+                pass
+
+        self._server = PooledHTTPServer((host, port), Handler, max_connections)
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+        self._routes = {
+            ("GET", "/health"): self._health,
+            ("GET", "/ready"): self._ready,
+            ("GET", "/metrics"): self._metrics,
+            ("POST", "/query"): self._query,
+            ("POST", "/search"): self._search,
+            ("POST", "/search_many"): self._search_many,
+        }
+
+    # ---------- Transport ----------
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        """Route la requête et convertit les erreurs en réponses JSON"""
+        path = handler.path.split("?", 1)[0]
+        route = self._routes.get((method, path))
+        try:
+            if route is None:
+                allowed = [m for (m, p) in self._routes if p == path]
+                if allowed:
+                    raise ApiError(405, "Méthode non autorisée", {"Allow": ", ".join(allowed)})
+                raise ApiError(404, f"Chemin inconnu: {path}")
+
+            body = self._read_body(handler) if method == "POST" else {}
+            with self.tracer.span(f"api {path}", method=method):
+                route(handler, body)
+        except ApiError as e:
+            self._send_json(handler, e.status, {"error": e.message}, e.headers)
+        except Exception as e:
+            print(f"❌ Erreur API {method} {path}: {e}")
+            self._send_json(handler, 500, {"error": "Erreur interne du serveur"})
+
+    def _read_body(self, handler: BaseHTTPRequestHandler) -> Dict[str, Any]:
+        """Lit et décode le corps JSON (taille bornée)"""
+        length = handler.headers.get("Content-Length")
+        if length is None:
+            # Corps de taille inconnue : impossible de le borner ni de garder la connexion
+            handler.close_connection = True
+            raise ApiError(411, "Content-Length requis")
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            handler.close_connection = True
+            raise ApiError(400, "Content-Length invalide")
+        if length > self.max_body_bytes:
+            # Corps non lu : la connexion ne peut pas être réutilisée
+            handler.close_connection = True
+            raise ApiError(413, f"Requête trop volumineuse (max {self.max_body_bytes} octets)")
+
+        raw = handler.rfile.read(length)
+        try:
+            body = json.loads(raw.decode("utf-8")) if raw else {}
+        except (UnicodeDecodeError, ValueError):
+            raise ApiError(400, "Corps JSON invalide")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Le corps doit être un objet JSON")
+        return body
+
+    def _send_json(self, handler: BaseHTTPRequestHandler, status: int, payload: Any,
+                   headers: Dict[str, str] = None) -> None:
+        """Réponse JSON complète (Content-Length : la connexion reste ouverte)"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        if handler.close_connection:
+            handler.send_header("Connection", "close")
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _send_ndjson(self, handler: BaseHTTPRequestHandler, lines: Iterator[Any]) -> None:
+        """Réponse en flux : une ligne JSON par élément (transfert chunked)"""
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"{NDJSON}; charset=utf-8")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        try:
+            for line in lines:
+                data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+                handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                handler.wfile.flush()
+        except Exception as e:
+            # En-têtes déjà envoyés : l'erreur est signalée dans le flux
+            print(f"❌ Erreur pendant le flux: {e}")
+            message = e.message if isinstance(e, ApiError) else "Erreur interne du serveur"
+            data = (json.dumps({"error": message}, ensure_ascii=False) + "\n").encode("utf-8")
+            handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    def _slot(self):
+        """Réserve un appel au moteur (503 si l'attente dépasse `queue_timeout`)"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ApiError(503, "Serveur saturé, réessayez", {"Retry-After": "1"})
+        return _Release(self._slots)
+
+    def _require_ready(self) -> None:
+        """503 tant que le moteur n'est pas chargé"""
+        if not self.engine.is_ready:
+            raise ApiError(503, f"Moteur en cours de chargement ({self.engine.state})", {"Retry-After": "5"})
+
+    @staticmethod
+    def _wants_stream(handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> bool:
+        """Flux demandé par le corps ("stream": true) ou par l'en-tête Accept"""
+        return bool(body.get("stream")) or NDJSON in handler.headers.get("Accept", "")
+
+    # ---------- Points d'accès ----------
+
+    def _health(self, handler, body):
+        self._send_json(handler, 200, {"status": "ok", "state": self.engine.state})
+
+    def _ready(self, handler, body):
+        if self.engine.is_ready:
+            self._send_json(handler, 200, {"ready": True})
+        else:
+            self._send_json(handler, 503, {"ready": False, "state": self.engine.state}, {"Retry-After": "5"})
+
+    def _metrics(self, handler, body):
+        payload = self.engine.metrics.render_prometheus().encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _query(self, handler, body):
+        question = require_text(body, "question")
+        options = parse_options(body, QUERY_OPTIONS)
+        self._require_ready()
+
+        if self._wants_stream(handler, body):
+            # Le créneau est tenu jusqu'à la fin du flux
+            with self._slot():
+                self._send_ndjson(handler, self.engine.query_stream(question, **options))
+            return
+
+        with self._slot():
+            response = self.engine.query(question, **options)
+        self._send_json(handler, 200, response)
+
+    def _search(self, handler, body):
+        query = require_text(body, "query")
+        options = parse_options(body)
+        self._require_ready()
+
+        with self._slot():
+            results = self.engine.search(query, **options)
+        self._send_json(handler, 200, {"results": results})
+
+    def _search_many(self, handler, body):
+        questions = body.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+            raise ApiError(400, "Champ 'questions' : liste de questions non vides attendue")
+        if len(questions) > self.max_batch:
+            raise ApiError(413, f"Lot trop grand (max {self.max_batch} questions)")
+        options = parse_options(body)
+        self._require_ready()
+
+        if self._wants_stream(handler, body):
+            self._send_ndjson(handler, self._search_batches(questions, options))
+            return
+
+        with self._slot():
+            results = self.engine.search_many(questions, **options)
+        self._send_json(handler, 200, {"results": results})
+
+    def _search_batches(self, questions, options) -> Iterator[Dict[str, Any]]:
+        """Résultats ligne par ligne, lot après lot (premières lignes envoyées au plus tôt)"""
+        for start in range(0, len(questions), STREAM_BATCH):
+            batch = questions[start:start + STREAM_BATCH]
+            with self._slot():
+                results = self.engine.search_many(batch, **options)
+            for offset, (question, question_results) in enumerate(zip(batch, results)):
+                yield {"index": start + offset, "question": question, "results": question_results}
+
+    # ---------- Cycle de vie ----------
+
+    def serve_forever(self) -> None:
+        """Sert les requêtes (bloquant)"""
+        print(f"🌐 API RAG sur http://{self.host}:{self.port}")
+        self._server.serve_forever()
+
+    def start(self) -> "RAGApiServer":
+        """Sert les requêtes dans un thread de fond"""
+        self._thread = threading.Thread(target=self.serve_forever, name="rag-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Arrête le serveur"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+
+class _Release:
+    """Libère un créneau du moteur en sortie de bloc `with`"""
+
+    def __init__(self, semaphore: threading.BoundedSemaphore):
+        self._semaphore = semaphore
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Options de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="Service HTTP JSON du moteur RAG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--chroma-path", default="data/chroma_db")
+    parser.add_argument("--max-workers", type=int, default=8, help="appels simultanés au moteur")
+    parser.add_argument("--max-connections", type=int, default=64, help="connexions servies simultanément")
+    parser.add_argument("--queue-timeout", type=float, default=10.0, help="attente max d'un créneau (s)")
+    parser.add_argument("--keepalive-timeout", type=float, default=15.0, help="inactivité max d'une connexion (s)")
+    parser.add_argument("--max-body-bytes", type=int, default=MAX_BODY_BYTES)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="questions max par /search_many")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Point d'entrée : un moteur partagé, chargé en arrière-plan (/ready indique quand il est prêt)"""
+    args = parse_args()
+
+    # Mêmes réglages que app.py (réponses pré-calculées valides, micro-lots)
+    engine = RAGEngine(chroma_path=args.chroma_path, batch_window_ms=5.0, lazy=True, **ENGINE_OPTIONS)
+    server = RAGApiServer(
+        engine,
+        host=args.host,
+        port=args.port,
+        max_workers=args.max_workers,
+        max_connections=args.max_connections,
+        queue_timeout=args.queue_timeout,
+        keepalive_timeout=args.keepalive_timeout,
+        max_body_bytes=args.max_body_bytes,
+        max_batch=args.max_batch
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt du service")
+    finally:
+        server.close()
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Interface utilisateur du chatbot RAG
 """
 
 import streamlit as st
+import os
 import sys
 from pathlib import Path
 
@@ -14,6 +15,8 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from src.rag import RAGEngine
 from src.auth import AuthSystem
+from src.precompute import ENGINE_OPTIONS, QUERY_OPTIONS, QUICK_QUESTIONS
+from src.tracing import get_tracer
 
 # Configuration de la page
 st.set_page_config(
@@ -28,11 +31,26 @@ st.set_page_config(
 def init_rag():
     """Initialise le moteur RAG"""
     try:
-        return RAGEngine()
+        # Moteur partagé par toutes les sessions : regrouper les recherches concurrentes.
+        # Chargement en arrière-plan pour afficher la page de connexion immédiatement.
+        # Réglages partagés avec le pré-calcul des réponses rapides (ingest.py)
+        return RAGEngine(batch_window_ms=5.0, lazy=True, **ENGINE_OPTIONS)
     except Exception as e:
         st.error(f"Erreur d'initialisation RAG: {e}")
         return None
 
+@st.cache_resource
+def init_metrics_server(_engine):
+    """Expose les métriques Prometheus si RAG_METRICS_PORT est défini (un seul serveur par processus)"""
+    port = os.environ.get("RAG_METRICS_PORT")
+    if not port or _engine is None:
+        return None
+    try:
+        return _engine.serve_metrics(port=int(port))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Serveur de métriques non démarré: {e}")
+        return None
+
 @st.cache_resource
 def init_auth():
     """Initialise le système d'authentification"""
@@ -48,7 +66,20 @@ if "rag_engine" not in st.session_state:
 
 # Initialiser
 rag_engine = init_rag()
+metrics_server = init_metrics_server(rag_engine)
 auth_system = init_auth()
+tracer = get_tracer()
+
+def wait_for_rag():
+    """Attend que le moteur RAG (chargé en arrière-plan) soit prêt"""
+    if rag_engine.is_ready:
+        return True
+    
+    with st.spinner("⏳ Chargement du modèle..."):
+        try:
+            return rag_engine.wait_until_ready()
+        except RuntimeError:
+            return False
 
 # ========== PAGES ==========
 
@@ -158,7 +189,7 @@ def chatbot_page():
         # Boutons rapides
         st.write("**Questions rapides :**")
         col_btns = st.columns(5)
-        quick_questions = ["Carthage", "Dougga", "El Jem", "Kerkouane", "Sbeitla"]
+        quick_questions = QUICK_QUESTIONS
         
         for i, (col, q) in enumerate(zip(col_btns, quick_questions)):
             with col:
@@ -168,21 +199,25 @@ def chatbot_page():
         # Recherche
         if st.button("🔍 Rechercher avec RAG", type="primary", use_container_width=True) or question:
             if question:
-                if not rag_engine:
+                if not rag_engine or not wait_for_rag():
                     st.error("Le moteur RAG n'est pas initialisé. Exécutez ingest.py d'abord.")
                 else:
-                    with st.spinner("🔍 Recherche en cours..."):
+                    # Trace de bout en bout (si échantillonnée, voir RAG_TRACE_SAMPLE)
+                    with tracer.span("chatbot_page", question=question, user=st.session_state.username):
                         try:
-                            result = rag_engine.query(question, k=3)
+                            # Flux : sources dès la fin de la recherche, puis la réponse au fil de l'eau
+                            events = rag_engine.query_stream(question, **QUERY_OPTIONS)
+                            with st.spinner("🔍 Recherche en cours..."):
+                                result = next(events)
                             
                             # Afficher les résultats
                             if result['confidence'] > 0:
                                 st.success(f"✅ {result['context_results']} résultat(s) trouvé(s)")
                                 st.markdown("---")
                                 
-                                # Réponse
+                                # Réponse (remplie progressivement plus bas)
                                 with st.expander("📝 Réponse complète", expanded=True):
-                                    st.write(result['answer'])
+                                    answer_placeholder = st.empty()
                                 
                                 # Sources
                                 if result['sources']:
@@ -200,9 +235,18 @@ def chatbot_page():
                                 with col_met3:
                                     st.metric("Status", "✅ Réponse fiable")
                                 
+                                answer = ""
+                                for event in events:
+                                    if event['type'] == "answer":
+                                        answer += event['text']
+                                        answer_placeholder.write(answer)
+                                
                             else:
                                 st.warning("⚠️ Aucune information pertinente trouvée.")
                                 st.info("💡 Essayez avec : Carthage, Dougga, El Jem, Kerkouane, Sbeitla")
+                                # Terminer le flux (compteurs et durées de la requête)
+                                for _ in events:
+                                    pass
                                 
                         except Exception as e:
                             st.error(f"Erreur lors de la recherche : {e}")
@@ -211,17 +255,27 @@ def chatbot_page():
         # Sidebar
         st.subheader("📚 Informations")
         
-        if rag_engine:
+        if rag_engine and rag_engine.is_ready:
             info = rag_engine.get_collection_info()
             st.metric("Documents", info['count'])
             st.metric("Sites", "5")
+        elif rag_engine and rag_engine.state != "error":
+            st.caption("⏳ Chargement du moteur RAG...")
         
         st.markdown("---")
         st.write("**🏛️ Sites disponibles :**")
-        sites = ["Carthage", "Dougga", "El Jem", "Kerkouane", "Sbeitla"]
+        sites = QUICK_QUESTIONS
         for site in sites:
             st.write(f"• {site}")
         
+        if rag_engine:
+            with st.expander("📈 Métriques du service"):
+                st.json(rag_engine.metrics.snapshot())
+        
+        if tracer.ring_buffer() is not None:
+            with st.expander("🐢 Requêtes les plus lentes"):
+                st.json(tracer.ring_buffer().slowest(5))
+        
         st.markdown("---")
         with st.expander("🤖 À propos du RAG"):
             st.write("""
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur RAG asynchrone
+Expose RAGEngine sous forme de coroutines (pour un front web asyncio)
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.rag import RAGEngine
+
+
+class AsyncRAGEngine:
+    """Façade asyncio autour d'un RAGEngine partagé
+
+    Les appels bloquants (embedding, ChromaDB) sont exécutés dans un pool de
+    threads borné, de sorte qu'une requête lente ne bloque pas la boucle
+    d'événements. Un seul modèle chargé sert toutes les sessions concurrentes.
+    """
+
+    def __init__(self, engine: Optional[RAGEngine] = None, max_workers: int = 4,
+                 max_pending: int = 64, default_timeout: Optional[float] = 30.0, **engine_kwargs):
+        """Initialise la façade (crée un RAGEngine si aucun n'est fourni)"""
+        self.engine = engine if engine is not None else RAGEngine(**engine_kwargs)
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag")
+        self._max_pending = max_pending
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Exécute un appel bloquant dans le pool, avec délai maximal et annulation"""
+        if self._slots is None:
+            # Créé paresseusement pour être lié à la boucle courante
+            self._slots = asyncio.Semaphore(self._max_pending)
+
+        timeout = self.default_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+
+        async with self._slots:
+            # Copie du contexte : le span et l'identifiant de requête suivent l'appel dans le thread
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+            # En cas d'annulation ou de dépassement, l'appelant est libéré immédiatement ;
+            # un appel déjà démarré dans un thread se termine en arrière-plan
+            return await asyncio.wait_for(future, timeout=timeout)
+
+    async def search(self, query: str, k: int = 3, timeout: Optional[float] = None,
+                     **options) -> List[Dict[str, Any]]:
+        """Recherche les documents les plus pertinents (`options` : ceux de RAGEngine.search)"""
+        return await self._run(self.engine.search, query, k=k, timeout=timeout, **options)
+
+    async def search_many(self, questions: List[str], k: int = 3,
+                          timeout: Optional[float] = None, **options) -> List[List[Dict[str, Any]]]:
+        """Recherche en lot (`options` : ceux de RAGEngine.search_many)"""
+        return await self._run(self.engine.search_many, questions, k=k, timeout=timeout, **options)
+
+    async def query(self, question: str, k: int = 3, timeout: Optional[float] = None, **options) -> Dict[str, Any]:
+        """Traite une requête complète (`options` : ceux de RAGEngine.query)"""
+        return await self._run(self.engine.query, question, k=k, timeout=timeout, **options)
+
+    async def query_many(self, questions: List[str], k: int = 3,
+                         timeout: Optional[float] = None, **options) -> List[Dict[str, Any]]:
+        """Traite un lot de requêtes complètes (`options` : ceux de RAGEngine.query_many)"""
+        return await self._run(self.engine.query_many, questions, k=k, timeout=timeout, **options)
+
+    async def get_collection_info(self) -> Dict[str, Any]:
+        """Retourne des informations sur la collection"""
+        return await self._run(self.engine.get_collection_info)
+
+    def close(self, wait: bool = True) -> None:
+        """Arrête le pool de threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self) -> "AsyncRAGEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close(wait=False)
+
+
+async def _demo():
+    """Démonstration : plusieurs questions traitées en parallèle"""
+    questions = ["Carthage", "théâtre de Dougga", "El Jem"]
+
+    async with AsyncRAGEngine() as rag:
+        results = await asyncio.gather(*(rag.query(q, k=2) for q in questions))
+
+    for question, result in zip(questions, results):
+        print(f"❓ {question} -> confiance {result['confidence']} ({len(result['sources'])} source(s))")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus synthétique de sites archéologiques
+Génère des chunks de style « guide de site » (~500 caractères) avec les mêmes
+métadonnées que ingest.load_documents (source, site, type, date), et des
+questions réalistes pour les benchmarks. Génération déterministe (graine).
+"""
+
+import random
+from typing import Any, Dict, Iterator, List
+
+# Sites réels de la base, puis d'autres sites tunisiens (régions à venir)
+SITES = [
+    "Carthage", "Dougga", "El Jem", "Kerkouane", "Sbeitla",
+    "Bulla Regia", "Thuburbo Majus", "Utique", "Makthar", "Haïdra",
+    "Chemtou", "Oudhna", "Zama", "Gightis", "Pupput",
+    "Neapolis", "Thysdrus", "Hadrumetum", "Thapsus", "Acholla"
+]
+
+MONUMENTS = [
+    "théâtre", "amphithéâtre", "capitole", "forum", "temple de Saturne", "thermes",
+    "arc de triomphe", "basilique", "mausolée", "nécropole", "port punique", "citerne",
+    "aqueduc", "villa à mosaïques", "marché", "temple de Junon Caelestis", "baptistère"
+]
+
+PERIODS = ["punique", "numide", "romaine", "byzantine", "vandale", "sévérienne", "antonine"]
+
+MATERIALS = ["calcaire local", "marbre de Chemtou", "grès ocre", "mosaïques polychromes", "briques crues"]
+
+TEMPLATES = [
+    "Le {monument} de {site} date de l'époque {period} et témoigne de la richesse de la cité.",
+    "Construit vers {year} {era}, le {monument} pouvait accueillir près de {capacity} personnes.",
+    "Les fouilles menées en {excavation} ont mis au jour le {monument}, bâti en {material}.",
+    "À {site}, le {monument} conserve des inscriptions latines dédiées aux empereurs.",
+    "Le site de {site} est inscrit au patrimoine mondial de l'UNESCO depuis {unesco}.",
+    "Les visiteurs peuvent admirer le {monument}, dont les colonnes en {material} sont restées debout.",
+    "Sous la domination {period}, {site} devint un centre agricole et commercial important.",
+    "Le {monument} fut restauré au {century} siècle, puis abandonné après la conquête arabe.",
+    "Des {material} découvertes près du {monument} sont exposées au musée du Bardo.",
+    "L'accès au {monument} se fait depuis l'entrée principale du site de {site}.",
+]
+
+QUESTION_TEMPLATES = [
+    "{site}",
+    "Parle-moi de {site}",
+    "Décris le {monument} de {site}",
+    "Quand a été construit le {monument} de {site} ?",
+    "Quels monuments visiter à {site} ?",
+    "Histoire de {site} à l'époque {period}",
+    "sites UNESCO en Tunisie",
+    "Où voir un {monument} {period} ?",
+]
+
+CENTURIES = ["IIe", "IIIe", "IVe", "Ve", "VIe"]
+
+
+def site_names(n_sites: int) -> List[str]:
+    """Noms de n sites (les sites réels d'abord, puis des variantes numérotées)"""
+    names = SITES[:n_sites]
+    i = 2
+    while len(names) < n_sites:
+        names.extend(f"{site} {i}" for site in SITES[:n_sites - len(names)])
+        i += 1
+    return names
+
+
+def _fill(template: str, rng: random.Random, site: str) -> str:
+    """Remplit un gabarit de phrase"""
+    return template.format(
+        site=site,
+        monument=rng.choice(MONUMENTS),
+        period=rng.choice(PERIODS),
+        material=rng.choice(MATERIALS),
+        year=rng.randint(100, 450),
+        era=rng.choice(["av. J.-C.", "ap. J.-C."]),
+        capacity=rng.randrange(2_000, 35_000, 500),
+        excavation=rng.randint(1880, 2020),
+        unesco=rng.choice([1979, 1985, 1997]),
+        century=rng.choice(CENTURIES)
+    )
+
+
+def generate_chunks(n: int, n_sites: int = None, chunk_chars: int = 500,
+                    seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """Génère n chunks {"id", "text", "metadata"} (à consommer par lots, sans tout garder en mémoire)
+
+    Par défaut, un site pour 2 000 chunks (5 sites au minimum), comme un
+    guide d'environ 2 000 chunks par site.
+    """
+    rng = random.Random(seed)
+    sites = site_names(n_sites or max(5, n // 2_000))
+
+    for i in range(n):
+        site = sites[i % len(sites)]
+        sentences = []
+        length = 0
+        while length < chunk_chars:
+            sentence = _fill(rng.choice(TEMPLATES), rng, site)
+            sentences.append(sentence)
+            length += len(sentence) + 1
+
+        yield {
+            "id": f"synth-{i}",
+            "text": " ".join(sentences),
+            "metadata": {
+                "source": site.lower().replace(" ", "_") + ".txt",
+                "site": site,
+                "type": "guide_officiel",
+                "date": "2024"
+            }
+        }
+
+
+def generate_questions(n: int, n_sites: int = 5, seed: int = 7) -> List[str]:
+    """n questions distinctes (les caches ne servent donc pas les mesures)"""
+    rng = random.Random(seed)
+    sites = site_names(n_sites)
+    questions = []
+    seen = set()
+    attempts = 0
+    while len(questions) < n and attempts < n * 100:
+        attempts += 1
+        question = _fill(rng.choice(QUESTION_TEMPLATES), rng, rng.choice(sites))
+        if question not in seen:
+            seen.add(question)
+            questions.append(question)
+    return questions
+
+
+def batched(iterable, size: int) -> Iterator[List[Any]]:
+    """Découpe un itérable en lots de `size` éléments"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
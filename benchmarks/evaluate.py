@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Évaluation de la qualité et de la latence de la recherche
+Passe les questions de référence (golden_set.json) par RAGEngine.retrieve, la
+recherche des réponses (routage par nom de site compris, sauf --no-route), et mesure
+recall@k, MRR et nDCG@k avec les latences p50/p99, pour la recherche
+approchée (ChromaDB/HNSW) et la recherche exacte (NumPy) sur les mêmes embeddings.
+
+Le rapport JSON (clés triées) se compare à une référence enregistrée : toute
+baisse de qualité au-delà de la tolérance fait échouer la commande.
+
+Usage : python benchmarks/evaluate.py [--baseline benchmarks/eval_baseline.json]
+                                      [--save-baseline] [--output rapport.json]
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from src.embeddings import get_embedding_backend
+from src.lexical import fold
+from src.rag import RAGEngine
+
+GOLDEN_SET = Path(__file__).parent / "golden_set.json"
+BASELINE = Path(__file__).parent / "eval_baseline.json"
+KS = [1, 3, 5, 10]
+BACKENDS = ["chroma", "numpy"]  # approché (HNSW), exact (force brute)
+MODES = ["vector", "hybrid"]
+QUALITY_METRICS = ("recall", "mrr", "ndcg", "overlap")
+TOLERANCE = 0.01
+
+
+def load_golden_set(path=GOLDEN_SET):
+    """Questions de référence"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["questions"]
+
+
+def is_relevant(item, metadata, content):
+    """Un chunk est pertinent s'il vient du site attendu et contient l'un des mots-clés (s'il y en a)"""
+    if (metadata or {}).get("site") != item["site"]:
+        return False
+    keywords = item.get("keywords")
+    if not keywords:
+        return True
+    text = fold(content or "")
+    return any(fold(keyword) in text for keyword in keywords)
+
+
+def relevant_ids(collection, item):
+    """Identifiants de tous les chunks pertinents pour une question"""
+    data = collection.get(where={"site": item["site"]}, include=["documents", "metadatas"])
+    return {
+        chunk_id
+        for chunk_id, content, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+        if is_relevant(item, metadata, content)
+    }
+
+
+def score_ranking(ranked_ids, relevant, ks=KS):
+    """recall@k, MRR (rang du premier pertinent, jusqu'à max(ks)) et nDCG@k (gains binaires)"""
+    scores = {}
+    first = next((rank for rank, chunk_id in enumerate(ranked_ids, start=1) if chunk_id in relevant), None)
+    scores["mrr"] = 1.0 / first if first else 0.0
+
+    for k in ks:
+        top = ranked_ids[:k]
+        hits = [chunk_id in relevant for chunk_id in top]
+        ideal = min(k, len(relevant))
+        scores[f"recall@{k}"] = sum(hits) / ideal if ideal else 0.0
+        dcg = sum(1.0 / math.log2(rank + 1) for rank, hit in enumerate(hits, start=1) if hit)
+        idcg = sum(1.0 / math.log2(rank + 1) for rank in range(1, ideal + 1))
+        scores[f"ndcg@{k}"] = dcg / idcg if idcg else 0.0
+
+    return scores
+
+
+def latency_percentiles(latencies):
+    """p50 et p99 des latences (ms)"""
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(ordered[int(0.50 * (len(ordered) - 1))], 3),
+        "p99_ms": round(ordered[int(0.99 * (len(ordered) - 1))], 3)
+    }
+
+
+def evaluate(engine, golden, mode="vector", ks=KS, relevance=None, exact=None, **search_options):
+    """Évalue un moteur ; `exact` : classements de la recherche exacte (recouvrement ANN/exact)
+
+    Une seule recherche à max(ks) par question ; les métriques @k portent sur ses k premiers résultats.
+    """
+    relevance = relevance if relevance is not None else [relevant_ids(engine.collection, item) for item in golden]
+    depth = max(ks)
+    totals = {}
+    latencies = []
+    rankings = []
+    per_question = []
+
+    for i, (item, relevant) in enumerate(zip(golden, relevance)):
+        start = time.perf_counter()
+        # Même chemin que les réponses : filtre des sites nommés si `route_sites` est actif
+        results = engine.retrieve(item["question"], depth, mode, **search_options)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        ranked = [r["chunk_id"] for r in results]
+        rankings.append(ranked)
+        scores = score_ranking(ranked, relevant, ks)
+        if exact is not None:
+            for k in ks:
+                reference = set(exact[i][:k])
+                scores[f"overlap@{k}"] = len(reference & set(ranked[:k])) / len(reference) if reference else 1.0
+
+        for name, value in scores.items():
+            totals[name] = totals.get(name, 0.0) + value
+        per_question.append({"question": item["question"], "relevant": len(relevant),
+                             "first_hit": next((r + 1 for r, c in enumerate(ranked) if c in relevant), None)})
+
+    n = len(golden)
+    return {
+        "metrics": {name: round(value / n, 4) for name, value in sorted(totals.items())},
+        "latency": latency_percentiles(latencies),
+        "questions": per_question
+    }, rankings
+
+
+def run(args):
+    """Évalue chaque combinaison (index, mode) sur la même collection et les mêmes embeddings"""
+    golden = load_golden_set(args.golden_set)
+    embedding_backend = get_embedding_backend(args.embedding_backend)
+    engines = {
+        backend: RAGEngine(chroma_path=args.chroma_path, embedding_backend=embedding_backend,
+                           search_backend=backend, embedding_cache_size=0, route_sites=not args.no_route)
+        for backend in BACKENDS
+    }
+
+    relevance = [relevant_ids(engines["numpy"].collection, item) for item in golden]
+    missing = [item["question"] for item, relevant in zip(golden, relevance) if not relevant]
+    if missing:
+        print(f"⚠️ Aucun chunk pertinent pour : {', '.join(missing)}")
+
+    report = {
+        "config": {
+            "golden_set": Path(args.golden_set).name,
+            "questions": len(golden),
+            "ks": args.ks,
+            "embedding_backend": embedding_backend.name,
+            "route_sites": not args.no_route,
+            "mmr": args.mmr,
+            "rerank": args.rerank,
+            "chunks": engines["numpy"].collection.count()
+        },
+        "runs": {}
+    }
+
+    try:
+        for mode in args.modes:
+            # Recherche exacte d'abord : référence du recouvrement pour la recherche approchée
+            exact_result, exact_rankings = evaluate(engines["numpy"], golden, mode, args.ks, relevance,
+                                                    mmr=args.mmr, rerank=args.rerank)
+            approx_result, _ = evaluate(engines["chroma"], golden, mode, args.ks, relevance, exact=exact_rankings,
+                                        mmr=args.mmr, rerank=args.rerank)
+            report["runs"][f"numpy/{mode}"] = exact_result
+            report["runs"][f"chroma/{mode}"] = approx_result
+    finally:
+        for engine in engines.values():
+            engine.close()
+
+    return report
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """Écarts avec la référence ; retourne la liste des régressions de qualité"""
+    regressions = []
+    for name, run_result in report["runs"].items():
+        reference = baseline.get("runs", {}).get(name)
+        if reference is None:
+            print(f"  🆕 {name}: absent de la référence")
+            continue
+
+        for metric, value in run_result["metrics"].items():
+            before = reference["metrics"].get(metric)
+            if before is None:
+                continue
+            delta = value - before
+            if abs(delta) >= 1e-4:
+                print(f"  {'📉' if delta < 0 else '📈'} {name} {metric}: {before:.4f} → {value:.4f} ({delta:+.4f})")
+            if delta < -tolerance and metric.split("@")[0] in QUALITY_METRICS:
+                regressions.append(f"{name} {metric}: {before:.4f} → {value:.4f}")
+
+        # Latence : indicative (dépend de la machine)
+        for key in ("p50_ms", "p99_ms"):
+            before, after = reference["latency"][key], run_result["latency"][key]
+            print(f"  ⏱️ {name} {key}: {before:.1f} → {after:.1f} ms")
+
+    return regressions
+
+
+def parse_args(argv=None):
+    """Options de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="Évaluation qualité/latence de la recherche RAG")
+    parser.add_argument("--chroma-path", default="data/chroma_db")
+    parser.add_argument("--golden-set", default=str(GOLDEN_SET))
+    parser.add_argument("--ks", type=int, nargs="+", default=KS)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=["vector", "lexical", "hybrid"])
+    parser.add_argument("--embedding-backend", default=None, help='"torch" ou "onnx-int8" (défaut : RAG_EMBEDDING_BACKEND)')
+    parser.add_argument("--mmr", action="store_true", help="diversification MMR des résultats")
+    parser.add_argument("--rerank", action="store_true", help="re-classement par cross-encoder")
+    parser.add_argument("--no-route", action="store_true", help="désactiver le routage par nom de site")
+    parser.add_argument("--baseline", default=str(BASELINE), help="rapport de référence à comparer")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer ce rapport comme référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="baisse de qualité tolérée")
+    parser.add_argument("--output", default=None, help="fichier JSON du rapport")
+    return parser.parse_args(argv)
+
+
+def write_report(report, path):
+    """Écrit un rapport JSON stable (clés triées) pour des diffs lisibles"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    """Point d'entrée"""
+    args = parse_args()
+
+    print("🎯 ÉVALUATION DE LA RECHERCHE (questions de référence)")
+    print("=" * 60)
+
+    report = run(args)
+    for name, result in report["runs"].items():
+        metrics = result["metrics"]
+        k = max(args.ks)
+        print(f"  {name:<16} recall@{k}={metrics[f'recall@{k}']:.3f}  MRR={metrics['mrr']:.3f}  "
+              f"nDCG@{k}={metrics[f'ndcg@{k}']:.3f}  p50={result['latency']['p50_ms']:.1f} ms  "
+              f"p99={result['latency']['p99_ms']:.1f} ms")
+
+    if args.output:
+        write_report(report, args.output)
+        print(f"💾 Rapport: {args.output}")
+
+    if args.save_baseline:
+        write_report(report, args.baseline)
+        print(f"💾 Référence enregistrée: {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"ℹ️ Pas de référence ({args.baseline}) : relancer avec --save-baseline pour l'enregistrer")
+        return
+
+    print("\n🔎 Comparaison avec la référence")
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+
+    print("=" * 60)
+    if regressions:
+        print(f"❌ {len(regressions)} régression(s) de qualité :")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+
+    print("✅ Pas de régression de qualité")
+
+
+if __name__ == "__main__":
+    main()
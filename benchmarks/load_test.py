@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de charge du moteur RAG partagé (sessions Streamlit simulées)
+Des visiteurs simultanés (threads ou tâches asyncio) interrogent un même RAGEngine,
+configuré comme dans app.py, avec un mélange de boutons « Questions rapides » et de
+questions libres, et éventuellement l'inscription/connexion.
+
+Modèles d'arrivée :
+- fermé (closed) : N sessions, chacune enchaîne question → temps de réflexion → question ;
+- ouvert (open) : arrivées de Poisson à débit fixe, indépendamment des réponses
+  (la latence compte depuis l'arrivée prévue : l'attente en file est incluse).
+
+Le rapport donne débit, percentiles de latence et taux d'erreur, au total et par
+fenêtre de temps.
+
+Usage : python benchmarks/load_test.py --users 50 --duration 60 [--arrival open --rate 20]
+                                       [--runner async] [--auth] [--output charge.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from src.async_rag import AsyncRAGEngine
+from src.auth import AuthSystem
+from src.benchmarks.corpus import generate_questions
+from src.precompute import ENGINE_OPTIONS, QUERY_OPTIONS, QUICK_QUESTIONS
+from src.rag import RAGEngine
+
+USERS = 50
+DURATION_S = 60.0
+THINK_S = 5.0
+QUICK_RATIO = 0.4
+INTERVAL_S = 5.0
+FREE_TEXT_QUESTIONS = 500
+
+
+class Recorder:
+    """Enregistre chaque opération : (instant de fin, type, latence ms, succès, erreur)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, kind, started, ok=True, error=None):
+        """Enregistre une opération commencée à `started` (perf_counter)"""
+        now = time.perf_counter()
+        with self._lock:
+            self.events.append((now - self.start, kind, (now - started) * 1000, ok, error))
+
+    def elapsed(self):
+        """Secondes écoulées depuis le début du test"""
+        return time.perf_counter() - self.start
+
+
+class QuestionMix:
+    """Tire des questions : boutons rapides (proportion `quick_ratio`) ou questions libres"""
+
+    def __init__(self, quick_ratio=QUICK_RATIO, seed=1):
+        self.quick_ratio = quick_ratio
+        self.free_text = generate_questions(FREE_TEXT_QUESTIONS, n_sites=len(QUICK_QUESTIONS))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self):
+        """Question suivante et son type ("quick" ou "free")"""
+        with self._lock:
+            if self._rng.random() < self.quick_ratio:
+                return self._rng.choice(QUICK_QUESTIONS), "quick"
+            return self._rng.choice(self.free_text), "free"
+
+
+def ask(engine, question, stream):
+    """Une question, comme l'application (flux consommé jusqu'au bout) ou via query"""
+    if stream:
+        for _ in engine.query_stream(question, **QUERY_OPTIONS):
+            pass
+    else:
+        engine.query(question, **QUERY_OPTIONS)
+
+
+def authenticate(auth, recorder, session):
+    """Inscription puis connexion d'un visiteur"""
+    username, password = f"charge_{session}", "motdepasse"
+    for kind, action in (("register", auth.register), ("login", auth.login)):
+        started = time.perf_counter()
+        try:
+            ok, message = action(username, password)
+            recorder.record(kind, started, ok, None if ok else message)
+        except Exception as e:
+            recorder.record(kind, started, False, f"{type(e).__name__}: {e}")
+
+
+def run_question(engine, mix, recorder, stream, started=None):
+    """Pose une question et enregistre sa latence (depuis `started` si fourni)"""
+    question, kind = mix.next()
+    started = started if started is not None else time.perf_counter()
+    try:
+        ask(engine, question, stream)
+        recorder.record(kind, started)
+    except Exception as e:
+        recorder.record(kind, started, False, f"{type(e).__name__}: {e}")
+
+
+def closed_loop_threads(engine, mix, recorder, args, auth=None):
+    """N sessions en threads, chacune avec un temps de réflexion exponentiel"""
+    deadline = time.perf_counter() + args.duration
+
+    def session(i):
+        rng = random.Random(i)
+        if auth is not None:
+            authenticate(auth, recorder, i)
+        while time.perf_counter() < deadline:
+            run_question(engine, mix, recorder, args.stream)
+            time.sleep(min(rng.expovariate(1.0 / args.think), max(0.0, deadline - time.perf_counter())))
+
+    threads = [threading.Thread(target=session, args=(i,), name=f"visiteur-{i}") for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+        # Montée en charge progressive : les sessions n'arrivent pas toutes au même instant
+        time.sleep(args.ramp_up / max(1, args.users))
+    for thread in threads:
+        thread.join()
+
+
+def open_loop_threads(engine, mix, recorder, args, auth=None):
+    """Arrivées de Poisson à `rate` requêtes/s, servies par au plus `users` threads"""
+    rng = random.Random(0)
+    deadline = time.perf_counter() + args.duration
+    arrival = time.perf_counter()
+    session = 0
+
+    def visit(scheduled, i):
+        if auth is not None:
+            authenticate(auth, recorder, i)
+        run_question(engine, mix, recorder, args.stream, started=scheduled)
+
+    with ThreadPoolExecutor(max_workers=args.users, thread_name_prefix="visiteur") as executor:
+        while arrival < deadline:
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(visit, arrival, session)
+            session += 1
+            arrival += rng.expovariate(args.rate)
+
+
+async def closed_loop_async(engine, mix, recorder, args, auth=None):
+    """N sessions en tâches asyncio (façade AsyncRAGEngine, pool de `users` threads)"""
+    deadline = time.perf_counter() + args.duration
+    async_engine = AsyncRAGEngine(engine, max_workers=args.users, max_pending=args.users * 2, default_timeout=None)
+    loop = asyncio.get_running_loop()
+
+    async def session(i):
+        rng = random.Random(i)
+        await asyncio.sleep(args.ramp_up * i / max(1, args.users))
+        if auth is not None:
+            await loop.run_in_executor(None, authenticate, auth, recorder, i)
+        while time.perf_counter() < deadline:
+            question, kind = mix.next()
+            started = time.perf_counter()
+            try:
+                await async_engine.query(question, **QUERY_OPTIONS)
+                recorder.record(kind, started)
+            except Exception as e:
+                recorder.record(kind, started, False, f"{type(e).__name__}: {e}")
+            await asyncio.sleep(min(rng.expovariate(1.0 / args.think), max(0.0, deadline - time.perf_counter())))
+
+    try:
+        await asyncio.gather(*(session(i) for i in range(args.users)))
+    finally:
+        async_engine.close(wait=True)
+
+
+async def open_loop_async(engine, mix, recorder, args, auth=None):
+    """Arrivées de Poisson en tâches asyncio (au plus `users` requêtes en cours)"""
+    rng = random.Random(0)
+    deadline = time.perf_counter() + args.duration
+    async_engine = AsyncRAGEngine(engine, max_workers=args.users, max_pending=args.users, default_timeout=None)
+    loop = asyncio.get_running_loop()
+    tasks = []
+
+    async def visit(scheduled, i):
+        if auth is not None:
+            await loop.run_in_executor(None, authenticate, auth, recorder, i)
+        question, kind = mix.next()
+        try:
+            await async_engine.query(question, **QUERY_OPTIONS)
+            recorder.record(kind, scheduled)
+        except Exception as e:
+            recorder.record(kind, scheduled, False, f"{type(e).__name__}: {e}")
+
+    try:
+        arrival = time.perf_counter()
+        session = 0
+        while arrival < deadline:
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            tasks.append(asyncio.create_task(visit(arrival, session)))
+            session += 1
+            arrival += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+    finally:
+        async_engine.close(wait=True)
+
+
+def percentiles(latencies):
+    """p50, p95, p99 et maximum (ms)"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1], 2)}
+
+
+def summarize(events, duration):
+    """Débit, latences et taux d'erreur d'un ensemble d'opérations"""
+    ok = [latency for _, _, latency, success, _ in events if success]
+    errors = len(events) - len(ok)
+    return {
+        "requests": len(events),
+        "errors": errors,
+        "error_rate": round(errors / len(events), 4) if events else 0.0,
+        "throughput_rps": round(len(ok) / duration, 2) if duration > 0 else 0.0,
+        **percentiles(ok)
+    }
+
+
+def build_report(recorder, args, wall_s):
+    """Rapport global, par type de question et par fenêtre de temps"""
+    events = recorder.events
+    questions = [e for e in events if e[1] in ("quick", "free")]
+    windows = []
+    t = 0.0
+    while t < wall_s:
+        window = [e for e in questions if t <= e[0] < t + args.interval]
+        windows.append({"t_s": round(t, 1), **summarize(window, min(args.interval, wall_s - t))})
+        t += args.interval
+
+    errors = {}
+    for _, _, _, success, error in events:
+        if not success:
+            errors[error] = errors.get(error, 0) + 1
+
+    return {
+        "config": {
+            "users": args.users,
+            "arrival": args.arrival,
+            "rate_rps": args.rate if args.arrival == "open" else None,
+            "think_s": args.think if args.arrival == "closed" else None,
+            "runner": args.runner,
+            "stream": args.stream,
+            "auth": args.auth,
+            "quick_ratio": args.quick_ratio,
+            "duration_s": args.duration,
+            "engine_options": ENGINE_OPTIONS,
+            "query_options": QUERY_OPTIONS
+        },
+        "wall_s": round(wall_s, 2),
+        "questions": summarize(questions, wall_s),
+        "by_kind": {
+            kind: summarize([e for e in events if e[1] == kind], wall_s)
+            for kind in sorted({e[1] for e in events})
+        },
+        "windows": windows,
+        "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:20])
+    }
+
+
+def parse_args(argv=None):
+    """Options de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="Test de charge du moteur RAG partagé")
+    parser.add_argument("--users", type=int, default=USERS, help="sessions simultanées (fermé) ou requêtes en cours max (ouvert)")
+    parser.add_argument("--duration", type=float, default=DURATION_S, help="durée du test (s)")
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed", help="modèle d'arrivée")
+    parser.add_argument("--rate", type=float, default=10.0, help="arrivées par seconde (modèle ouvert)")
+    parser.add_argument("--think", type=float, default=THINK_S, help="temps de réflexion moyen (modèle fermé, s)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="durée d'arrivée des sessions (modèle fermé, s)")
+    parser.add_argument("--runner", choices=["threads", "async"], default="threads")
+    parser.add_argument("--stream", action="store_true", help="consommer query_stream comme l'application (threads)")
+    parser.add_argument("--auth", action="store_true", help="inscription et connexion de chaque visiteur")
+    parser.add_argument("--quick-ratio", type=float, default=QUICK_RATIO, help="part des boutons « Questions rapides »")
+    parser.add_argument("--interval", type=float, default=INTERVAL_S, help="fenêtre de temps du rapport (s)")
+    parser.add_argument("--chroma-path", default="data/chroma_db")
+    parser.add_argument("--output", default=None, help="fichier JSON du rapport")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Point d'entrée"""
+    args = parse_args()
+    if args.stream and args.runner == "async":
+        print("⚠️ --stream n'est disponible qu'avec --runner threads : ignoré")
+        args.stream = False
+
+    print("🏋️ TEST DE CHARGE DU MOTEUR RAG")
+    print("=" * 60)
+
+    # Même configuration que app.py : un moteur partagé, micro-lots de 5 ms
+    engine = RAGEngine(chroma_path=args.chroma_path, batch_window_ms=5.0, lazy=True, **ENGINE_OPTIONS)
+    started = time.perf_counter()
+    engine.wait_until_ready()
+    print(f"⏳ Moteur prêt en {time.perf_counter() - started:.1f}s")
+
+    # Fichier utilisateurs temporaire : le test ne touche pas data/users.json
+    auth_dir = tempfile.mkdtemp(prefix="rag_charge_") if args.auth else None
+    auth = AuthSystem(users_file=os.path.join(auth_dir, "users.json")) if args.auth else None
+
+    mix = QuestionMix(args.quick_ratio)
+    recorder = Recorder()
+    print(f"🚦 {args.users} visiteur(s), modèle {args.arrival}, {args.runner}, {args.duration:.0f}s")
+    try:
+        if args.runner == "threads":
+            runner = closed_loop_threads if args.arrival == "closed" else open_loop_threads
+            runner(engine, mix, recorder, args, auth)
+        else:
+            runner = closed_loop_async if args.arrival == "closed" else open_loop_async
+            asyncio.run(runner(engine, mix, recorder, args, auth))
+        wall_s = recorder.elapsed()
+    finally:
+        engine.close()
+        if auth_dir:
+            shutil.rmtree(auth_dir, ignore_errors=True)
+
+    report = build_report(recorder, args, wall_s)
+    report["engine"] = {
+        "scheduler": engine.scheduler.stats() if engine.scheduler is not None else None,
+        "single_flight": engine._inflight.stats(),
+        "response_cache": engine.response_cache.stats(),
+        "stages": engine.latency_summary()
+    }
+
+    print("=" * 60)
+    for window in report["windows"]:
+        print(f"  t={window['t_s']:>6.1f}s  {window['throughput_rps']:>7.2f} req/s  "
+              f"p50={window['p50_ms']} ms  p99={window['p99_ms']} ms  erreurs={window['errors']}")
+    total = report["questions"]
+    print(f"📊 {total['requests']} questions, {total['throughput_rps']} req/s, p50={total['p50_ms']} ms, "
+          f"p95={total['p95_ms']} ms, p99={total['p99_ms']} ms, erreurs {total['error_rate']:.2%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
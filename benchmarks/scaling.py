@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de montée en charge du corpus (1k → 1M chunks)
+Pour chaque taille : génère un corpus synthétique, l'ingère dans ChromaDB comme
+ingest.py, puis mesure le temps de construction, le chargement du moteur, les
+percentiles de latence de RAGEngine.search / query, le débit, la mémoire (RSS)
+et la taille sur disque.
+
+Usage : python benchmarks/scaling.py [--scales 1000 10000 100000 1000000]
+                                     [--random-embeddings] [--output resultats.json]
+
+Avec le modèle MiniLM, l'ingestion d'un million de chunks prend plusieurs heures
+sur CPU ; --random-embeddings remplace les embeddings du corpus par des vecteurs
+aléatoires pour mesurer la recherche seule (les questions restent embeddées par le modèle).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from src.benchmarks.corpus import batched, generate_chunks, generate_questions
+from src.embeddings import get_embedding_backend
+from src.lexical import BM25Index, BM25_FILENAME
+from src.precompute import ENGINE_OPTIONS, QUERY_OPTIONS
+from src.rag import RAGEngine
+
+SCALES = [1_000, 10_000, 100_000, 1_000_000]
+COLLECTION_NAME = "sites_archeologiques_tunisie"
+DIM = 384  # all-MiniLM-L6-v2
+INGEST_BATCH = 1_000
+N_QUERIES = 200
+N_WARMUP = 5
+THREADS = 8
+K = 3
+
+
+def percentiles(latencies):
+    """Moyenne, p50, p95, p99 et maximum des latences (ms)"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1], 3)
+    }
+
+
+def rss_bytes():
+    """Mémoire résidente actuelle du processus (Linux), sinon None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_bytes():
+    """Pic de mémoire résidente du processus"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def disk_bytes(path):
+    """Taille totale des fichiers d'un dossier"""
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def build_collection(path, n, embedding_backend, random_embeddings, seed=42):
+    """Ingère n chunks synthétiques (mêmes métadonnées de collection que ingest.py)"""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(
+        COLLECTION_NAME,
+        metadata={
+            "description": f"Corpus synthétique de {n} chunks (benchmark)",
+            "hnsw:space": "cosine",
+            "version": datetime.now().isoformat(),
+            "embedding_backend": "random" if random_embeddings else embedding_backend.name
+        }
+    )
+
+    rng = np.random.default_rng(seed)
+    embed_s = add_s = 0.0
+    for batch in batched(generate_chunks(n, seed=seed), INGEST_BATCH):
+        texts = [chunk["text"] for chunk in batch]
+
+        start = time.perf_counter()
+        if random_embeddings:
+            vectors = rng.standard_normal((len(batch), DIM)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            embeddings = vectors.tolist()
+        else:
+            embeddings = embedding_backend.embed_documents(texts)
+        embed_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        collection.add(
+            ids=[chunk["id"] for chunk in batch],
+            documents=texts,
+            metadatas=[chunk["metadata"] for chunk in batch],
+            embeddings=embeddings
+        )
+        add_s += time.perf_counter() - start
+
+    # Index lexical BM25, comme à l'ingestion
+    start = time.perf_counter()
+    BM25Index.from_collection(collection).save(os.path.join(path, BM25_FILENAME))
+    bm25_s = time.perf_counter() - start
+
+    return {
+        "embedding_s": round(embed_s, 3),
+        "index_add_s": round(add_s, 3),
+        "bm25_s": round(bm25_s, 3),
+        "build_s": round(embed_s + add_s + bm25_s, 3),
+        "chunks_per_s": round(n / max(embed_s + add_s, 1e-9), 1)
+    }
+
+
+def time_calls(func, questions):
+    """Latences (ms) d'un appel par question, en séquence"""
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        func(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def throughput(func, questions, threads):
+    """Requêtes par seconde avec `threads` appels concurrents"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(func, questions))
+    return round(len(questions) / (time.perf_counter() - start), 2)
+
+
+def run_scale(n, args, embedding_backend, questions):
+    """Construit le corpus de taille n et mesure le moteur RAG"""
+    path = tempfile.mkdtemp(prefix=f"rag_bench_{n}_", dir=args.workdir)
+    try:
+        build = build_collection(path, n, embedding_backend, args.random_embeddings)
+        disk = disk_bytes(path)
+
+        # Caches désactivés : chaque mesure passe par le modèle et l'index
+        engine = RAGEngine(
+            chroma_path=path,
+            embedding_cache_size=0,
+            response_cache_size=0,
+            embedding_backend=embedding_backend,
+            search_backend=args.search_backend,
+            **ENGINE_OPTIONS
+        )
+        try:
+            # Premiers appels : index paresseux (métadonnées, routage des sites, BM25)
+            start = time.perf_counter()
+            for question in questions[:N_WARMUP]:
+                engine.query(question, **QUERY_OPTIONS)
+            warmup_s = time.perf_counter() - start
+
+            search = time_calls(lambda q: engine.search(q, k=K), questions)
+            query = time_calls(lambda q: engine.query(q, **QUERY_OPTIONS), questions)
+
+            start = time.perf_counter()
+            engine.search_many(questions, k=K)
+            batched_qps = round(len(questions) / (time.perf_counter() - start), 2)
+
+            row = {
+                "n": n,
+                "build": build,
+                "load_s": round(engine.load_time, 3),
+                "warmup_s": round(warmup_s, 3),
+                "search": percentiles(search),
+                "query": percentiles(query),
+                "throughput_qps": {
+                    "search_sequential": round(len(search) / (sum(search) / 1000), 2),
+                    f"search_{args.threads}_threads": throughput(lambda q: engine.search(q, k=K),
+                                                                 questions, args.threads),
+                    "search_many_batch": batched_qps
+                },
+                "query_stages": engine.latency_summary(),
+                "rss_bytes": rss_bytes(),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "disk_bytes": disk
+            }
+        finally:
+            engine.close()
+    finally:
+        if not args.keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return row
+
+
+def run(args):
+    """Exécute le benchmark pour chaque taille ; s'arrête à la première qui échoue
+
+    Un échec dès la première taille est une erreur de configuration, pas un
+    point de rupture : il est propagé au lieu d'être enregistré comme résultat.
+    """
+    embedding_backend = get_embedding_backend(args.embedding_backend)
+    questions = generate_questions(args.queries)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "config": {
+            "embedding_backend": embedding_backend.name,
+            "random_embeddings": args.random_embeddings,
+            "search_backend": args.search_backend,
+            "queries": len(questions),
+            "k": K,
+            "query_options": QUERY_OPTIONS,
+            "engine_options": ENGINE_OPTIONS
+        },
+        "results": []
+    }
+
+    for n in args.scales:
+        print(f"\n📦 n={n:,} chunks")
+        try:
+            row = run_scale(n, args, embedding_backend, questions)
+        except Exception as e:
+            if not report["results"]:
+                raise
+            # Point de rupture : inutile d'essayer les tailles supérieures
+            report["results"].append({"n": n, "error": f"{type(e).__name__}: {e}"})
+            print(f"❌ Échec à n={n:,}: {e}")
+            break
+
+        report["results"].append(row)
+        print(f"  🏗️ construction {row['build']['build_s']:.1f}s ({row['build']['chunks_per_s']:.0f} chunks/s)  "
+              f"chargement {row['load_s']:.1f}s  disque {row['disk_bytes'] / 2**20:.1f} Mo")
+        print(f"  🔍 search p50={row['search']['p50_ms']:.1f} ms p99={row['search']['p99_ms']:.1f} ms  "
+              f"query p50={row['query']['p50_ms']:.1f} ms p99={row['query']['p99_ms']:.1f} ms")
+        print(f"  🚀 {row['throughput_qps']}  RSS {(row['rss_bytes'] or 0) / 2**20:.0f} Mo")
+
+        if args.max_p99_ms and row["query"]["p99_ms"] > args.max_p99_ms:
+            print(f"⚠️ p99 au-delà de {args.max_p99_ms} ms : arrêt de la montée en charge")
+            break
+
+    return report
+
+
+def parse_args(argv=None):
+    """Options de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="Benchmark de montée en charge du moteur RAG")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES, help="tailles de corpus (chunks)")
+    parser.add_argument("--queries", type=int, default=N_QUERIES, help="questions mesurées par taille")
+    parser.add_argument("--threads", type=int, default=THREADS, help="appels concurrents pour le débit")
+    parser.add_argument("--embedding-backend", default=None, help='"torch" ou "onnx-int8" (défaut : RAG_EMBEDDING_BACKEND)')
+    parser.add_argument("--random-embeddings", action="store_true",
+                        help="embeddings aléatoires pour le corpus (ingestion rapide)")
+    parser.add_argument("--search-backend", default="chroma", choices=["chroma", "numpy"])
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="arrêter dès que le p99 de query dépasse ce seuil")
+    parser.add_argument("--workdir", default=None, help="dossier des bases temporaires")
+    parser.add_argument("--keep", action="store_true", help="conserver les bases générées")
+    parser.add_argument("--output", default=None, help="fichier JSON des résultats")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Point d'entrée"""
+    args = parse_args()
+
+    print("⏱️ BENCHMARK DE MONTÉE EN CHARGE DU CORPUS")
+    print("=" * 60)
+
+    report = run(args)
+
+    print("=" * 60)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Résultats: {args.output}")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark : recherche exacte NumPy vs ChromaDB (HNSW)
+Mesure la latence d'une requête top-k selon la taille du corpus et
+repère le point de bascule où HNSW devient plus rapide que la recherche exacte
+
+Usage : python benchmarks/search_crossover.py [fichier_resultats.json]
+"""
+
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from src.vector_index import ChromaIndex, NumpyIndex
+
+SIZES = [100, 1_000, 10_000, 50_000, 100_000, 250_000]
+DIM = 384  # all-MiniLM-L6-v2
+N_QUERIES = 200
+K = 3
+CHROMA_BATCH = 5_000
+
+
+def random_unit_vectors(n, dim, rng):
+    """Vecteurs aléatoires normalisés (float32)"""
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def time_queries(index, queries, k=K):
+    """Latences (ms) d'une requête à la fois"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.query([query], k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    """Médiane et p95 des latences"""
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 4)
+    }
+
+
+def run(sizes=SIZES):
+    """Exécute le benchmark pour chaque taille de corpus"""
+    import chromadb
+    from chromadb.config import Settings
+
+    rng = np.random.default_rng(42)
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    rows = []
+
+    for n in sizes:
+        corpus = random_unit_vectors(n, DIM, rng)
+        queries = random_unit_vectors(N_QUERIES, DIM, rng)
+        ids = [f"chunk-{i}" for i in range(n)]
+
+        # Index NumPy
+        start = time.perf_counter()
+        numpy_index = NumpyIndex(ids, corpus)
+        numpy_build = time.perf_counter() - start
+
+        # Index ChromaDB
+        collection = client.create_collection(f"bench_{n}", metadata={"hnsw:space": "cosine"})
+        start = time.perf_counter()
+        for i in range(0, n, CHROMA_BATCH):
+            collection.add(ids=ids[i:i + CHROMA_BATCH], embeddings=corpus[i:i + CHROMA_BATCH].tolist())
+        chroma_build = time.perf_counter() - start
+        chroma_index = ChromaIndex(collection)
+
+        # Lot de questions : un seul produit matriciel côté NumPy
+        start = time.perf_counter()
+        numpy_index.query(queries, k=K)
+        numpy_batch = (time.perf_counter() - start) * 1000 / N_QUERIES
+
+        row = {
+            "n": n,
+            "numpy": {**summarize(time_queries(numpy_index, queries)),
+                      "build_s": round(numpy_build, 3), "batched_ms_per_query": round(numpy_batch, 4)},
+            "chroma": {**summarize(time_queries(chroma_index, queries)), "build_s": round(chroma_build, 3)}
+        }
+        rows.append(row)
+        client.delete_collection(f"bench_{n}")
+
+        print(f"n={n:>8}  numpy p50={row['numpy']['p50_ms']:.3f} ms  "
+              f"chroma p50={row['chroma']['p50_ms']:.3f} ms  "
+              f"numpy (lot)={row['numpy']['batched_ms_per_query']:.3f} ms/q")
+
+    crossover = next((r["n"] for r in rows if r["chroma"]["p50_ms"] < r["numpy"]["p50_ms"]), None)
+    return {"dim": DIM, "k": K, "queries": N_QUERIES, "results": rows, "crossover_n": crossover}
+
+
+def main():
+    """Point d'entrée"""
+    print("⏱️ BENCHMARK RECHERCHE EXACTE (NumPy) vs HNSW (ChromaDB)")
+    print("=" * 60)
+
+    report = run()
+
+    print("=" * 60)
+    if report["crossover_n"]:
+        print(f"📉 ChromaDB devient plus rapide à partir de n={report['crossover_n']}")
+    else:
+        print("📈 NumPy reste plus rapide sur toutes les tailles testées")
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Résultats: {sys.argv[1]}")
+
+
+if __name__ == "__main__":
+    main()
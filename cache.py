@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caches en mémoire pour le moteur RAG
+Caches LRU (et LRU avec expiration) bornés et thread-safe, avec compteurs de statistiques
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Normalise une question (Unicode NFC, casse, espaces) pour servir de clé de cache"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    """Cache LRU borné et thread-safe (maxsize=0 : cache désactivé, toujours en échec)"""
+
+    def __init__(self, maxsize: int = 1024):
+        """Initialise le cache avec une taille maximale"""
+        if maxsize < 0:
+            raise ValueError("maxsize doit être positif ou nul")
+
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Retourne la valeur associée à la clé (et la marque comme récente)"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Ajoute ou met à jour une entrée, en évinçant la plus ancienne si besoin"""
+        if self.maxsize == 0:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = value
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+class TTLCache(LRUCache):
+    """Cache LRU dont les entrées expirent après `ttl` secondes"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        """Initialise le cache avec une taille maximale et une durée de vie"""
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Retourne la valeur si elle est présente et non expirée"""
+        entry = super().get(key, self._MISSING)
+        if entry is self._MISSING:
+            return default
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            with self._lock:
+                # Compter comme un échec plutôt qu'un succès
+                if self._data.get(key) is entry:
+                    del self._data[key]
+                self.hits -= 1
+                self.misses += 1
+                self.expirations += 1
+            return default
+
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Ajoute une entrée valable `ttl` secondes"""
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache"""
+        stats = super().stats()
+        stats.update({"ttl": self.ttl, "expirations": self.expirations})
+        return stats
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compression extractive du contexte
+Découpe les chunks retrouvés en phrases, les score contre la question et garde
+les meilleures phrases non redondantes dans un budget de caractères (ou de tokens)
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.cache import LRUCache
+
+# Fin de phrase : ponctuation suivie d'une majuscule ou d'un chiffre, ou saut de ligne
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+(?=[A-ZÀ-ÖØ-Þ0-9«\"])|\n+")
+
+# Abréviations après lesquelles on ne coupe pas (« av. J.-C. », « env. 200 »...)
+_ABBREVIATION_RE = re.compile(r"\b(?:av|ap|env|cf|etc|St|Ste|Mme|M|p)\.$")
+
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    """Découpe un texte en phrases (les fragments trop courts sont rattachés à la suivante)"""
+    sentences = []
+    pending = ""
+    for part in _SENTENCE_RE.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}".strip()
+        if len(pending) >= min_chars and not _ABBREVIATION_RE.search(pending):
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class ContextPacker:
+    """Sélectionne les phrases les plus utiles du contexte sous un budget
+
+    Toutes les phrases sont embeddées en un seul lot (avec cache) et scorées
+    contre la question en un seul produit matriciel. La sélection gloutonne
+    écarte les phrases trop proches d'une phrase déjà retenue (chevauchement
+    des chunks). Les phrases retenues sont regroupées par chunk d'origine,
+    dans leur ordre initial, pour conserver l'attribution des sources.
+    """
+
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]], budget_chars: int = 800,
+                 budget_tokens: Optional[int] = None, count_tokens: Callable[[str], int] = None,
+                 redundancy_threshold: float = 0.9, cache_size: int = 4096):
+        """Initialise le compresseur avec une fonction d'embedding"""
+        self.embed = embed
+        self.budget_chars = budget_chars
+        self.budget_tokens = budget_tokens
+        self.count_tokens = count_tokens or (lambda text: len(text.split()))
+        self.redundancy_threshold = redundancy_threshold
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def _sentence_embeddings(self, sentences: List[str]) -> np.ndarray:
+        """Embeddings normalisés des phrases (seules les absentes du cache passent par le modèle)"""
+        embeddings = [self.cache.get(sentence) for sentence in sentences]
+        missing = list(dict.fromkeys(s for s, e in zip(sentences, embeddings) if e is None))
+        if missing:
+            computed = dict(zip(missing, self.embed(missing)))
+            for sentence, embedding in computed.items():
+                self.cache.put(sentence, embedding)
+            embeddings = [computed.get(s, e) for s, e in zip(sentences, embeddings)]
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+    def pack(self, query_embedding, context_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Retourne les résultats réduits à leurs meilleures phrases (même format que l'entrée)"""
+        # (indice du résultat, position dans le chunk, phrase)
+        units = [
+            (r_idx, s_idx, sentence)
+            for r_idx, result in enumerate(context_results)
+            for s_idx, sentence in enumerate(split_sentences(result['content']))
+        ]
+        if not units:
+            return context_results
+
+        sentences = [sentence for _, _, sentence in units]
+        embeddings = self._sentence_embeddings(sentences)
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = embeddings @ query
+
+        # Sélection gloutonne par score décroissant, sous budget, sans redondance
+        selected: List[int] = []
+        used_chars = used_tokens = 0
+        for i in np.argsort(-scores):
+            sentence = sentences[i]
+            chars = len(sentence)
+            tokens = self.count_tokens(sentence) if self.budget_tokens is not None else 0
+            if used_chars + chars > self.budget_chars:
+                continue
+            if self.budget_tokens is not None and used_tokens + tokens > self.budget_tokens:
+                continue
+            if selected and float(np.max(embeddings[selected] @ embeddings[i])) >= self.redundancy_threshold:
+                continue
+            selected.append(int(i))
+            used_chars += chars
+            used_tokens += tokens
+
+        if not selected:
+            # Budget plus petit que la meilleure phrase : la garder tronquée
+            best = int(np.argmax(scores))
+            selected = [best]
+            sentences[best] = sentences[best][:self.budget_chars]
+
+        # Regrouper par chunk d'origine, dans l'ordre initial
+        by_result: Dict[int, List[str]] = {}
+        for i in sorted(selected, key=lambda i: units[i][:2]):
+            by_result.setdefault(units[i][0], []).append(sentences[i])
+
+        return [
+            dict(context_results[r_idx], content=" ".join(kept))
+            for r_idx, kept in sorted(by_result.items())
+        ]
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Diversification des résultats par pertinence marginale maximale (MMR)
+Écarte les chunks quasi dupliqués (chevauchement du découpage) en une sélection vectorisée NumPy
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normalise chaque ligne (norme L2 = 1)"""
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+def mmr_select(query_embedding, candidate_embeddings, k: int = 3, lambda_mult: float = 0.5) -> List[int]:
+    """Sélectionne k candidats maximisant λ·pertinence - (1 - λ)·redondance
+
+    Les similarités question/candidats et candidats/candidats sont calculées
+    en deux produits matriciels ; chaque itération de la sélection ne fait
+    ensuite que des opérations vectorielles sur ces matrices.
+    Retourne les indices des candidats retenus, dans l'ordre de sélection.
+    """
+    candidates = _normalize(np.asarray(candidate_embeddings, dtype=np.float32))
+    n = len(candidates)
+    k = min(k, n)
+    if k == 0:
+        return []
+
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    # Similarité maximale de chaque candidat à l'ensemble déjà retenu (mise à jour incrémentale)
+    max_similarity = similarity[selected[0]].copy()
+
+    for _ in range(k - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
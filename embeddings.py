@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends d'embedding pour le moteur RAG et l'ingestion
+PyTorch (sentence-transformers) ou ONNX Runtime quantifié int8, sélectionnables par configuration
+
+Le backend ONNX nécessite les dépendances optionnelles `onnxruntime` et
+`optimum[onnxruntime]` (pour l'export et la quantification du modèle).
+"""
+
+import os
+import sys
+from typing import Any, Dict, List
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = "data/models/all-MiniLM-L6-v2-onnx-int8"
+
+
+class EmbeddingBackend:
+    """Interface commune des backends d'embedding
+
+    Un backend est utilisable à la fois comme fonction d'embedding ChromaDB
+    (`__call__`) et comme objet `Embeddings` LangChain (`embed_documents`,
+    `embed_query`). Les vecteurs retournés sont normalisés (norme L2 = 1).
+    """
+
+    name = "base"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Calcule les embeddings d'une liste de textes"""
+        raise NotImplementedError
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Interface ChromaDB"""
+        return self.embed(list(input))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Interface LangChain (documents)"""
+        return self.embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Interface LangChain (requête)"""
+        return self.embed([text])[0]
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Modèle sentence-transformers en pleine précision (PyTorch)"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, device: str = "cpu", batch_size: int = 32):
+        """Charge le modèle PyTorch"""
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Calcule les embeddings d'une liste de textes"""
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.tolist()
+
+
+class OnnxInt8Backend(EmbeddingBackend):
+    """Même modèle exporté en ONNX et quantifié int8 (dynamique) pour CPU"""
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, model_dir: str = DEFAULT_ONNX_DIR,
+                 max_length: int = 256, num_threads: int = None):
+        """Charge (et exporte au premier lancement) le modèle ONNX quantifié"""
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            export_quantized_model(model_name, model_dir)
+
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Calcule les embeddings (mean pooling + normalisation, comme sentence-transformers)"""
+        import numpy as np
+
+        if not texts:
+            return []
+
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling sur les tokens réels
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        # Normalisation L2
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32).tolist()
+
+
+def export_quantized_model(model_name: str = DEFAULT_MODEL, output_dir: str = DEFAULT_ONNX_DIR) -> str:
+    """Exporte le modèle en ONNX puis le quantifie en int8 (quantification dynamique)"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    print(f"📦 Export ONNX de {model_name}...")
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    print("🗜️ Quantification int8...")
+    quantizer = ORTQuantizer.from_pretrained(output_dir)
+    config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=config)
+
+    model_path = os.path.join(output_dir, "model_quantized.onnx")
+    print(f"✅ Modèle quantifié: {model_path}")
+    return model_path
+
+
+BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+
+def get_embedding_backend(name: str = None, **kwargs) -> EmbeddingBackend:
+    """Instancie le backend demandé (par défaut : variable RAG_EMBEDDING_BACKEND, sinon "torch")"""
+    if isinstance(name, EmbeddingBackend):
+        return name
+
+    name = name or os.environ.get("RAG_EMBEDDING_BACKEND", SentenceTransformerBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend d'embedding inconnu: {name} (disponibles: {', '.join(BACKENDS)})")
+
+    return BACKENDS[name](**kwargs)
+
+
+def check_parity(texts: List[str], reference: EmbeddingBackend, candidate: EmbeddingBackend) -> Dict[str, Any]:
+    """Compare deux backends : similarité cosinus entre vecteurs d'un même texte"""
+    cosines = []
+    for ref, cand in zip(reference.embed(texts), candidate.embed(texts)):
+        dot = sum(a * b for a, b in zip(ref, cand))
+        norm = (sum(a * a for a in ref) ** 0.5) * (sum(b * b for b in cand) ** 0.5)
+        cosines.append(dot / norm if norm else 0.0)
+
+    return {
+        "texts": len(texts),
+        "min_cosine": round(min(cosines), 4),
+        "mean_cosine": round(sum(cosines) / len(cosines), 4),
+        "max_drift": round(1 - min(cosines), 4)
+    }
+
+
+PARITY_TEXTS = [
+    "Carthage",
+    "théâtre de Dougga",
+    "Colisée d'El Jem",
+    "La cité punique de Kerkouane et ses maisons",
+    "Les temples du forum de Sbeitla",
+    "Quels sites sont inscrits au patrimoine mondial de l'UNESCO ?",
+    "L'amphithéâtre de Thysdrus a été construit vers 238 ap. J.-C.",
+]
+
+
+def main():
+    """Test de parité : dérive cosinus du backend ONNX int8 par rapport à PyTorch"""
+    max_drift = float(sys.argv[1]) if len(sys.argv) > 1 else 0.03
+
+    print("🧪 TEST DE PARITÉ DES EMBEDDINGS (PyTorch vs ONNX int8)")
+    print("=" * 50)
+
+    report = check_parity(PARITY_TEXTS, SentenceTransformerBackend(), OnnxInt8Backend())
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+
+    if report["max_drift"] > max_drift:
+        print(f"❌ Dérive {report['max_drift']} > seuil {max_drift}")
+        sys.exit(1)
+
+    print(f"✅ Dérive {report['max_drift']} <= seuil {max_drift}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filtres de métadonnées pour le moteur RAG
+Index par champ (site, source, type, date) utilisé pour pré-filtrer les recherches
+
+Syntaxe des filtres :
+    {"site": "Dougga"}                         valeur exacte
+    {"site": ["Dougga", "Carthage"]}           une valeur parmi plusieurs
+    {"date": {"gte": "2020", "lte": "2024"}}   intervalle (gt, gte, lt, lte)
+Les conditions sur des champs différents sont combinées par un ET.
+"""
+
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+INDEXED_FIELDS = ("site", "source", "type", "date")
+
+_COMPARATORS = {
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def _comparable(value: Any, bound: Any):
+    """Compare numériquement si possible (ex. "2024" et 2020), sinon comme chaînes"""
+    try:
+        return float(value), float(bound)
+    except (TypeError, ValueError):
+        return str(value), str(bound)
+
+
+def validate_filters(filters: Dict[str, Any], fields: Sequence[str] = INDEXED_FIELDS) -> None:
+    """Vérifie la syntaxe d'un filtre (champs indexés, opérateurs, valeurs simples) ; lève ValueError"""
+    for field, condition in filters.items():
+        if field not in fields:
+            raise ValueError(f"Champ non indexé: {field} (indexés: {', '.join(fields)})")
+
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(_COMPARATORS)
+            if unknown:
+                raise ValueError(f"Opérateur de filtre inconnu pour '{field}': {', '.join(sorted(map(str, unknown)))}")
+            if not condition:
+                raise ValueError(f"Condition vide pour '{field}' (opérateurs: {', '.join(_COMPARATORS)})")
+            values = list(condition.values())
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            values = list(condition)
+        else:
+            values = [condition]
+
+        if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+            raise ValueError(f"Valeur de filtre invalide pour '{field}' (chaîne ou nombre attendu)")
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Représentation stable et hachable d'un filtre (clé de cache)"""
+    if not filters:
+        return None
+    return json.dumps(filters, sort_keys=True, ensure_ascii=False, default=sorted)
+
+
+class ResolvedFilter:
+    """Filtre résolu : valeurs retenues par champ et identifiants des chunks correspondants"""
+
+    def __init__(self, values: Dict[str, List[Any]], ids: Set[str]):
+        self.values = values
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def where(self) -> Optional[Dict[str, Any]]:
+        """Clause `where` ChromaDB équivalente"""
+        clauses = [{field: {"$in": values}} for field, values in self.values.items()]
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+
+
+class MetadataIndex:
+    """Index inversé champ -> valeur -> identifiants de chunks"""
+
+    def __init__(self, fields: Sequence[str] = INDEXED_FIELDS):
+        """Initialise un index vide"""
+        self.fields = tuple(fields)
+        self.ids: List[str] = []
+        self.postings: Dict[str, Dict[Any, Set[str]]] = {field: defaultdict(set) for field in self.fields}
+
+    @classmethod
+    def build(cls, ids: Sequence[str], metadatas: Sequence[Dict[str, Any]], **kwargs) -> "MetadataIndex":
+        """Construit l'index à partir des métadonnées des chunks"""
+        index = cls(**kwargs)
+        index.ids = list(ids)
+        for chunk_id, metadata in zip(ids, metadatas):
+            for field in index.fields:
+                value = (metadata or {}).get(field)
+                if value is not None:
+                    index.postings[field][value].add(chunk_id)
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "MetadataIndex":
+        """Construit l'index à partir d'une collection ChromaDB"""
+        data = collection.get(include=["metadatas"])
+        return cls.build(data["ids"], data["metadatas"], **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def values(self, field: str) -> List[Any]:
+        """Valeurs distinctes connues d'un champ"""
+        return sorted(self.postings.get(field, {}), key=str)
+
+    def _match_values(self, field: str, condition: Any) -> List[Any]:
+        """Valeurs du champ satisfaisant une condition"""
+        known = self.postings[field]
+
+        if isinstance(condition, dict):
+            return [
+                value for value in known
+                if all(_COMPARATORS[op](*_comparable(value, bound)) for op, bound in condition.items())
+            ]
+
+        if isinstance(condition, (list, tuple, set, frozenset)):
+            return [value for value in condition if value in known]
+
+        return [condition] if condition in known else []
+
+    def resolve(self, filters: Dict[str, Any]) -> ResolvedFilter:
+        """Résout un filtre en valeurs par champ et en ensemble d'identifiants"""
+        validate_filters(filters, self.fields)
+        values: Dict[str, List[Any]] = {}
+        ids: Optional[Set[str]] = None
+
+        for field, condition in filters.items():
+            matched = self._match_values(field, condition)
+            values[field] = matched
+
+            field_ids = set().union(*(self.postings[field][value] for value in matched))
+            ids = field_ids if ids is None else ids & field_ids
+
+        return ResolvedFilter(values, ids if ids is not None else set(self.ids))
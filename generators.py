@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de génération de réponses pour le moteur RAG
+Générateur extractif déterministe (par défaut, utilisé pour les tests) ou LLM local llama.cpp sur CPU
+
+Le backend llama.cpp nécessite la dépendance optionnelle `llama-cpp-python`
+et un modèle GGUF (chemin passé en paramètre ou via RAG_LLAMA_MODEL).
+"""
+
+import codecs
+import os
+import threading
+from typing import Any, Dict, Iterator, List
+
+SYSTEM_PROMPT = (
+    "Tu es un guide expert des sites archéologiques de Tunisie. "
+    "Réponds en français, de façon concise, uniquement à partir du contexte fourni. "
+    "Si le contexte ne permet pas de répondre, dis-le.\n\n"
+)
+
+
+class Generator:
+    """Interface commune des générateurs
+
+    `stream` produit la réponse fragment par fragment. Le contexte est
+    d'abord réduit par `pack_context` pour respecter le budget de tokens
+    `max_context_tokens`.
+    """
+
+    name = "base"
+
+    def __init__(self, max_context_tokens: int = 1024):
+        self.max_context_tokens = max_context_tokens
+
+    def count_tokens(self, text: str) -> int:
+        """Nombre (approché) de tokens d'un texte"""
+        return len(text.split())
+
+    def pack_context(self, context_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Garde les résultats, dans l'ordre, tant que le budget de tokens le permet"""
+        packed = []
+        used = 0
+        for result in context_results:
+            tokens = self.count_tokens(result['content'])
+            if used + tokens > self.max_context_tokens:
+                if not packed:
+                    # Toujours garder au moins le meilleur résultat, tronqué au budget
+                    words = result['content'].split()[:self.max_context_tokens]
+                    packed.append(dict(result, content=" ".join(words)))
+                break
+            packed.append(result)
+            used += tokens
+        return packed
+
+    def stream(self, question: str, context_results: List[Dict[str, Any]]) -> Iterator[str]:
+        """Génère la réponse fragment par fragment"""
+        raise NotImplementedError
+
+    def generate(self, question: str, context_results: List[Dict[str, Any]]) -> str:
+        """Génère la réponse complète"""
+        return "".join(self.stream(question, context_results))
+
+
+class ExtractiveGenerator(Generator):
+    """Générateur déterministe : restitue le contexte retenu, chunk par chunk"""
+
+    name = "extractive"
+
+    def stream(self, question: str, context_results: List[Dict[str, Any]]) -> Iterator[str]:
+        """Génère la réponse fragment par fragment"""
+        yield "D'après les informations disponibles :\n\n"
+
+        for i, result in enumerate(self.pack_context(context_results)):
+            yield ("\n\n" if i else "") + result['content']
+
+
+class LlamaCppGenerator(Generator):
+    """LLM local (GGUF) via llama.cpp, sur CPU
+
+    Le préfixe fixe (prompt système) est évalué une seule fois : son état KV
+    est sauvegardé puis restauré avant chaque requête, de sorte que seuls le
+    contexte et la question sont évalués à chaque appel.
+    """
+
+    name = "llama-cpp"
+
+    def __init__(self, model_path: str = None, n_ctx: int = 2048, n_threads: int = None,
+                 max_tokens: int = 256, max_context_tokens: int = 1024, temperature: float = 0.2):
+        """Charge le modèle et pré-calcule l'état du prompt système"""
+        from llama_cpp import Llama
+
+        super().__init__(max_context_tokens=max_context_tokens)
+        model_path = model_path or os.environ.get("RAG_LLAMA_MODEL")
+        if not model_path:
+            raise ValueError("Chemin du modèle GGUF manquant (paramètre model_path ou RAG_LLAMA_MODEL)")
+
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+
+        # Un contexte llama.cpp ne peut servir qu'une génération à la fois
+        self._lock = threading.Lock()
+
+        # Évaluer le préfixe une fois et garder son état KV
+        self._prefix_tokens = self.llm.tokenize(SYSTEM_PROMPT.encode("utf-8"), add_bos=True)
+        self.llm.eval(self._prefix_tokens)
+        self._prefix_state = self.llm.save_state()
+
+    def count_tokens(self, text: str) -> int:
+        """Nombre exact de tokens selon le tokenizer du modèle"""
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def stream(self, question: str, context_results: List[Dict[str, Any]]) -> Iterator[str]:
+        """Génère la réponse token par token"""
+        context = "\n\n".join(r['content'] for r in self.pack_context(context_results))
+        suffix = f"Contexte :\n{context}\n\nQuestion : {question}\nRéponse :"
+        suffix_tokens = self.llm.tokenize(suffix.encode("utf-8"), add_bos=False)
+
+        # Les tokens UTF-8 peuvent être coupés entre deux tokens : décodage incrémental
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        eos = self.llm.token_eos()
+
+        with self._lock:
+            # Restaurer l'état du préfixe : seul le suffixe est évalué
+            self.llm.load_state(self._prefix_state)
+
+            generated = 0
+            for token in self.llm.generate(self._prefix_tokens + suffix_tokens, temp=self.temperature, reset=True):
+                if token == eos or generated >= self.max_tokens:
+                    break
+                generated += 1
+                text = decoder.decode(self.llm.detokenize([token]))
+                if text:
+                    yield text
+
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+GENERATORS = {
+    ExtractiveGenerator.name: ExtractiveGenerator,
+    LlamaCppGenerator.name: LlamaCppGenerator,
+}
+
+
+def get_generator(name: str = None, **kwargs) -> Generator:
+    """Instancie le générateur demandé (par défaut : variable RAG_GENERATOR, sinon "extractive")"""
+    if isinstance(name, Generator):
+        return name
+
+    name = name or os.environ.get("RAG_GENERATOR", ExtractiveGenerator.name)
+    if name not in GENERATORS:
+        raise ValueError(f"Générateur inconnu: {name} (disponibles: {', '.join(GENERATORS)})")
+
+    return GENERATORS[name](**kwargs)
@@ -7,6 +7,7 @@ Charge les documents, les nettoie et les indexe dans ChromaDB
 
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Ajouter le chemin src
@@ -14,11 +15,14 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from langchain.document_loaders import TextLoader, PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 import chromadb
 from chromadb.config import Settings
 
+from src.embeddings import get_embedding_backend
+from src.lexical import BM25Index, BM25_FILENAME
+from src.precompute import build_precomputed_answers
+
 def load_documents(data_dir="data/raw"):
     """Charge tous les documents depuis le dossier raw"""
     documents = []
@@ -70,19 +74,28 @@ def create_chunks(documents, chunk_size=500, chunk_overlap=50):
     print(f"📊 {len(chunks)} chunks créés")
     return chunks
 
-def create_vector_store(chunks, persist_directory="data/chroma_db"):
+def create_vector_store(chunks, persist_directory="data/chroma_db", embedding_backend=None):
     """Crée et sauvegarde la base vectorielle ChromaDB"""
     
     # Créer le dossier si nécessaire
     os.makedirs(persist_directory, exist_ok=True)
     
-    # Initialiser les embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
+    client = chromadb.PersistentClient(
+        path=persist_directory,
+        settings=Settings(anonymized_telemetry=False)
     )
     
+    # Repartir d'une collection vide (évite les doublons lors d'une ré-ingestion)
+    try:
+        client.delete_collection("sites_archeologiques_tunisie")
+        print("🗑️ Ancienne collection supprimée")
+    except ValueError:
+        pass
+    
+    # Initialiser les embeddings ("torch" ou "onnx-int8", cf. RAG_EMBEDDING_BACKEND)
+    embeddings = get_embedding_backend(embedding_backend)
+    print(f"🧠 Backend d'embedding: {embeddings.name}")
+    
     # Créer la base vectorielle
     vectorstore = Chroma.from_documents(
         documents=chunks,
@@ -91,7 +104,10 @@ def create_vector_store(chunks, persist_directory="data/chroma_db"):
         collection_name="sites_archeologiques_tunisie",
         collection_metadata={
             "description": "Base de connaissances des sites archéologiques de Tunisie",
-            "hnsw:space": "cosine"
+            "hnsw:space": "cosine",
+            # Tampon de version : invalide les caches de réponses du moteur RAG
+            "version": datetime.now().isoformat(),
+            "embedding_backend": embeddings.name
         }
     )
     
@@ -99,15 +115,16 @@ def create_vector_store(chunks, persist_directory="data/chroma_db"):
     vectorstore.persist()
     
     # Vérification
-    client = chromadb.PersistentClient(
-        path=persist_directory,
-        settings=Settings(anonymized_telemetry=False)
-    )
-    
     collection = client.get_collection("sites_archeologiques_tunisie")
     print(f"🎉 Base ChromaDB créée avec succès!")
     print(f"📍 Emplacement: {persist_directory}")
     print(f"📈 Documents indexés: {collection.count()}")
+    print(f"🏷️ Version: {collection.metadata.get('version')}")
+    
+    # Index lexical BM25 (recherche hybride)
+    bm25 = BM25Index.from_collection(collection)
+    bm25.save(os.path.join(persist_directory, BM25_FILENAME))
+    print(f"🔤 Index BM25: {len(bm25.idf)} termes")
     
     return vectorstore
 
@@ -133,7 +150,12 @@ def main():
     print("\n🔧 Création de la base ChromaDB...")
     vectorstore = create_vector_store(chunks)
     
-    # 4. Test de vérification
+    # 4. Réponses pré-calculées (questions rapides de l'application)
+    print("\n⚡ Pré-calcul des réponses rapides...")
+    path = build_precomputed_answers()
+    print(f"💾 Réponses sauvegardées: {path}")
+    
+    # 5. Test de vérification
     print("\n🧪 Test de recherche...")
     test_query = "Carthage"
     results = vectorstore.similarity_search(test_query, k=2)
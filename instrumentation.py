@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation du moteur RAG
+Mesure des étapes d'une requête (perf_counter_ns) et histogrammes de latence en mémoire (p50/p95/p99)
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+# Bornes supérieures des seaux de latence (ms), échelle quasi logarithmique
+DEFAULT_BUCKETS_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")
+)
+
+
+class StageTimer:
+    """Chronomètre les étapes d'une requête
+
+    Chaque étape est un `span` ; les durées (ms) sont cumulées par nom dans
+    `timings`. Des durées mesurées ailleurs peuvent y être ajoutées avec `add`.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Mesure la durée du bloc"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter_ns() - start) / 1e6)
+
+    def add(self, name: str, duration_ms: float) -> None:
+        """Ajoute une durée (ms) à une étape"""
+        self.timings[name] = self.timings.get(name, 0.0) + duration_ms
+
+    def rounded(self, digits: int = 3) -> Dict[str, float]:
+        """Durées arrondies (pour les réponses)"""
+        return {name: round(value, digits) for name, value in self.timings.items()}
+
+
+class LatencyHistogram:
+    """Histogramme de latences à seaux fixes (mémoire constante, thread-safe)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        """Enregistre une latence (ms)"""
+        index = bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value_ms
+            self.min = min(self.min, value_ms)
+            self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Percentile estimé par interpolation linéaire dans le seau concerné"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+
+            rank = q * self.count
+            cumulative = 0
+            for i, bucket_count in enumerate(self.counts):
+                if cumulative + bucket_count >= rank and bucket_count:
+                    lower = self.buckets[i - 1] if i else 0.0
+                    upper = self.buckets[i] if self.buckets[i] != float("inf") else self.max
+                    lower, upper = max(lower, self.min), min(upper, self.max)
+                    return lower + (upper - lower) * (rank - cumulative) / bucket_count
+                cumulative += bucket_count
+
+            return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Nombre, moyenne et percentiles (ms)"""
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max, 3)
+        }
+
+
+class StageHistograms:
+    """Un histogramme de latence par étape"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self._buckets = buckets
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """Histogramme d'une étape (créé à la première utilisation)"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self._buckets)
+            return histogram
+
+    def record(self, timings: Dict[str, float]) -> None:
+        """Enregistre les durées des étapes d'une requête"""
+        for stage, value in timings.items():
+            self.histogram(stage).observe(value)
+
+    def stages(self) -> Dict[str, LatencyHistogram]:
+        """Copie du dictionnaire étape -> histogramme"""
+        with self._lock:
+            return dict(self._histograms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Résumé par étape"""
+        return {stage: histogram.summary() for stage, histogram in sorted(self.stages().items())}
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche lexicale BM25 et fusion de classements
+Index inversé construit à l'ingestion, fusion par rang réciproque (RRF) avec la recherche vectorielle
+"""
+
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+BM25_FILENAME = "bm25_index.json"
+
+# Mots vides français (et quelques mots anglais courants)
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en", "est", "et",
+    "il", "ils", "la", "le", "les", "leur", "lui", "ma", "mais", "me", "mes", "moi", "mon", "ne",
+    "nos", "notre", "nous", "on", "ou", "par", "pas", "pour", "qu", "que", "qui", "sa", "se",
+    "ses", "son", "sur", "ta", "te", "tes", "toi", "ton", "tu", "un", "une", "vos", "votre",
+    "vous", "y", "d", "l", "j", "m", "n", "s", "t", "c", "the", "of", "and", "in", "to", "is",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Supprime les accents et met en minuscules"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte en termes (sans accents, minuscules, sans mots vides)"""
+    return [token for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Index inversé avec pondération Okapi BM25"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """Initialise un index vide"""
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.idf: Dict[str, float] = {}
+        self.avgdl = 0.0
+        self.version: Optional[str] = None
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str],
+              metadatas: Sequence[Dict[str, Any]] = None, version: str = None, **kwargs) -> "BM25Index":
+        """Construit l'index à partir des chunks"""
+        index = cls(**kwargs)
+        index.ids = list(ids)
+        index.documents = list(documents)
+        index.metadatas = list(metadatas) if metadatas is not None else [{} for _ in index.ids]
+        index.version = version
+
+        postings = defaultdict(list)
+        for doc_idx, document in enumerate(index.documents):
+            terms = tokenize(document or "")
+            index.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings[term].append((doc_idx, tf))
+
+        index.postings = dict(postings)
+        index._compute_statistics()
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "BM25Index":
+        """Construit l'index à partir d'une collection ChromaDB"""
+        data = collection.get(include=["documents", "metadatas"])
+        version = (collection.metadata or {}).get("version")
+        return cls.build(data["ids"], data["documents"], data["metadatas"], version=version, **kwargs)
+
+    def _compute_statistics(self) -> None:
+        """Calcule la longueur moyenne des documents et les IDF"""
+        n = len(self.doc_lengths)
+        self.avgdl = sum(self.doc_lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int = 3, allowed: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Retourne les k meilleurs (indice du chunk, score BM25)"""
+        allowed = set(allowed) if allowed is not None else None
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_idx, tf in self.postings[term]:
+                if allowed is not None and doc_idx not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / (self.avgdl or 1.0))
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def query(self, query_texts: Sequence[str], k: int = 3, ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """Recherche au format de `collection.query` de ChromaDB
+
+        Les scores BM25 n'étant pas bornés, la « distance » retournée est
+        1 - score / meilleur score de la question (0 pour le meilleur chunk).
+        Si `ids` est fourni, seuls ces chunks sont évalués.
+        """
+        allowed = None
+        if ids is not None:
+            allowed = {i for i, chunk_id in enumerate(self.ids) if chunk_id in ids}
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in query_texts:
+            hits = self.search(query, k=k, allowed=allowed)
+            top = hits[0][1] if hits else 1.0
+            results["ids"].append([self.ids[i] for i, _ in hits])
+            results["documents"].append([self.documents[i] for i, _ in hits])
+            results["metadatas"].append([self.metadatas[i] for i, _ in hits])
+            results["distances"].append([1.0 - score / top for _, score in hits])
+
+        return results
+
+    def save(self, path: str) -> None:
+        """Sauvegarde l'index en JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.version,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Charge un index sauvegardé"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.version = data["version"]
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.metadatas = data["metadatas"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        index._compute_statistics()
+        return index
+
+
+def load_or_build(collection, persist_directory: str) -> BM25Index:
+    """Charge l'index sauvegardé s'il correspond à la version de la collection, sinon le reconstruit"""
+    path = os.path.join(persist_directory, BM25_FILENAME)
+    version = (collection.metadata or {}).get("version")
+
+    # Sans tampon de version, rien ne prouve que l'index sauvegardé est à jour
+    if version is not None and os.path.exists(path):
+        index = BM25Index.load(path)
+        if index.version == version:
+            return index
+
+    return BM25Index.from_collection(collection)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], rrf_k: int = 60) -> List[Tuple[str, float]]:
+    """Fusionne plusieurs classements d'identifiants : score = somme des 1 / (rrf_k + rang)"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (rrf_k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métriques du service RAG
+Registre de compteurs, jauges et histogrammes exporté au format texte Prometheus
+(point d'accès HTTP local) et en instantané JSON
+"""
+
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.instrumentation import StageHistograms
+
+# Échantillon : (suffixe du nom, étiquettes, valeur)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    """Valeur au format texte Prometheus"""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Étiquettes au format texte Prometheus ({a="1",b="2"})"""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    """Famille de métriques étiquetées
+
+    Les valeurs sont soit tenues par la métrique (`inc`, `set`), soit lues à
+    chaque collecte par `func`, qui retourne une valeur ou un dictionnaire
+    {valeurs des étiquettes: valeur} (None : métrique absente pour l'instant).
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 func: Callable[[], Any] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Valeurs des étiquettes, dans l'ordre déclaré"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Étiquettes attendues pour {self.name}: {self.labelnames}, reçues: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _current(self) -> Dict[Tuple[str, ...], float]:
+        """Valeurs courantes par jeu d'étiquettes"""
+        if self.func is None:
+            with self._lock:
+                return dict(self._values)
+
+        value = self.func()
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            return {(): float(value)}
+        return {
+            (key if isinstance(key, tuple) else (key,)): float(v)
+            for key, v in value.items() if v is not None
+        }
+
+    def samples(self) -> Iterator[Sample]:
+        """Échantillons exportés"""
+        for key, value in sorted(self._current().items()):
+            yield "", dict(zip(self.labelnames, key)), value
+
+    def snapshot(self) -> Any:
+        """Valeur(s) pour l'instantané JSON"""
+        values = self._current()
+        if not self.labelnames:
+            return values.get((), 0.0)
+        return {",".join(key): value for key, value in sorted(values.items())}
+
+
+class Counter(Metric):
+    """Compteur monotone"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Incrémente le compteur"""
+        if amount < 0:
+            raise ValueError("Un compteur ne peut pas décroître")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Valeur instantanée (peut monter ou descendre)"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """Fixe la valeur de la jauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Augmente (ou diminue) la jauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(Metric):
+    """Histogramme à seaux fixes, étiqueté par une seule étiquette
+
+    Les histogrammes par valeur d'étiquette sont tenus par un `StageHistograms`,
+    éventuellement partagé avec le moteur (durées des étapes en millisecondes).
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label: str = "stage",
+                 histograms: StageHistograms = None):
+        super().__init__(name, documentation, (label,))
+        self.histograms = histograms if histograms is not None else StageHistograms()
+
+    def observe(self, value: float, label_value: str) -> None:
+        """Enregistre une observation (dans l'unité des histogrammes)"""
+        self.histograms.histogram(label_value).observe(value)
+
+    def samples(self) -> Iterator[Sample]:
+        """Seaux cumulés, somme et nombre d'observations"""
+        label = self.labelnames[0]
+        for label_value, histogram in sorted(self.histograms.stages().items()):
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, count = histogram.sum, histogram.count
+
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                yield "_bucket", {label: label_value, "le": _format_value(bound)}, cumulative
+            yield "_sum", {label: label_value}, total
+            yield "_count", {label: label_value}, count
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Nombre, moyenne et percentiles par valeur d'étiquette"""
+        return self.histograms.summary()
+
+
+class MetricsRegistry:
+    """Registre des métriques du service"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Enregistre une métrique (une seule par nom)"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                func: Callable[[], Any] = None) -> Counter:
+        """Crée et enregistre un compteur"""
+        return self.register(Counter(name, documentation, labelnames, func))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              func: Callable[[], Any] = None) -> Gauge:
+        """Crée et enregistre une jauge"""
+        return self.register(Gauge(name, documentation, labelnames, func))
+
+    def histogram(self, name: str, documentation: str, label: str = "stage",
+                  histograms: StageHistograms = None) -> Histogram:
+        """Crée et enregistre un histogramme"""
+        return self.register(Histogram(name, documentation, label, histograms))
+
+    def get(self, name: str) -> Optional[Metric]:
+        """Métrique enregistrée sous ce nom (None si absente)"""
+        return self._metrics.get(name)
+
+    def metrics(self) -> List[Metric]:
+        """Métriques enregistrées, par nom"""
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render_prometheus(self) -> str:
+        """Toutes les métriques au format d'exposition texte Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # Une métrique en échec (moteur en chargement...) ne bloque pas les autres
+                print(f"⚠️ Métrique {metric.name} indisponible: {e}")
+                continue
+
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Instantané JSON des métriques (nom -> valeur ou valeurs par étiquettes)"""
+        snapshot = {}
+        for metric in self.metrics():
+            try:
+                snapshot[metric.name] = metric.snapshot()
+            except Exception as e:
+                snapshot[metric.name] = None
+                print(f"⚠️ Métrique {metric.name} indisponible: {e}")
+        return snapshot
+
+
+class MetricsServer:
+    """Point d'accès HTTP local : /metrics (texte Prometheus) et /metrics.json"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        """Démarre le serveur dans un thread de fond (port 0 : port libre choisi par le système)"""
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                path = handler.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    handler.send_error(404)
+                    return
+
+                handler.send_response(200)
+                handler.send_header("Content-Type", content_type)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                # Pas de journal par requête : les scrapes sont fréquents
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="rag-metrics", daemon=True)
+        self._thread.start()
+        print(f"📈 Métriques exposées sur http://{self.host}:{self.port}/metrics")
+
+    def close(self) -> None:
+        """Arrête le serveur"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5.0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Réponses pré-calculées pour les questions rapides et les présentations de sites
+Calculées à l'ingestion et servies par le moteur RAG sans passer par le modèle
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.cache import normalize_query
+from src.filters import filters_key
+
+PRECOMPUTED_FILENAME = "precomputed_answers.json"
+
+# Boutons « Questions rapides » et sites de la barre latérale de l'application
+QUICK_QUESTIONS = ["Carthage", "Dougga", "El Jem", "Kerkouane", "Sbeitla"]
+
+# Budget de tokens du contexte, optionnel (LLM à petite fenêtre de contexte)
+_BUDGET_TOKENS = os.environ.get("RAG_CONTEXT_BUDGET_TOKENS")
+
+# Réglages partagés par l'application et le pré-calcul (les réponses doivent être identiques)
+ENGINE_OPTIONS = {
+    "context_budget_chars": 800,
+    "context_budget_tokens": int(_BUDGET_TOKENS) if _BUDGET_TOKENS else None
+}
+QUERY_OPTIONS = {"k": 3, "mmr": True}
+
+
+def answer_key(question: str, k: int = 3, mode: str = None, filters: Dict[str, Any] = None,
+               rerank: bool = False, mmr: bool = False) -> str:
+    """Clé d'une réponse pré-calculée (mêmes paramètres que RAGEngine.query)"""
+    return json.dumps([normalize_query(question), k, mode, filters_key(filters), rerank, mmr], ensure_ascii=False)
+
+
+def precompute_answers(engine, questions: List[str] = QUICK_QUESTIONS, **options) -> Dict[str, Any]:
+    """Calcule résultats, contexte compressé, sources et confiance de chaque question"""
+    options = {**QUERY_OPTIONS, **options}
+    answers = {}
+
+    for question in questions:
+        results = engine.retrieve(question, **options)
+        response = engine.respond(question, results)
+        answers[answer_key(question, **options)] = {
+            "question": question,
+            "results": results,
+            "response": response
+        }
+        print(f"  ⚡ {question}: {len(results)} résultat(s), confiance {response['confidence']}")
+
+    return {
+        "version": (engine.collection.metadata or {}).get("version"),
+        "generator": engine.generator.name,
+        "context_budget_chars": engine.context_budget_chars,
+        "context_budget_tokens": engine.context_budget_tokens,
+        "created_at": datetime.now().isoformat(),
+        "answers": answers
+    }
+
+
+def save_answers(store: Dict[str, Any], persist_directory: str = "data/chroma_db") -> str:
+    """Sauvegarde les réponses pré-calculées à côté de la base ChromaDB"""
+    path = os.path.join(persist_directory, PRECOMPUTED_FILENAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_answers(persist_directory: str = "data/chroma_db") -> Optional[Dict[str, Any]]:
+    """Charge les réponses pré-calculées (None si absentes ou illisibles)"""
+    path = os.path.join(persist_directory, PRECOMPUTED_FILENAME)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Réponses pré-calculées illisibles: {e}")
+        return None
+
+
+def build_precomputed_answers(persist_directory: str = "data/chroma_db") -> str:
+    """Pré-calcule et sauvegarde les réponses rapides avec les réglages de l'application"""
+    from src.rag import RAGEngine
+
+    engine = RAGEngine(chroma_path=persist_directory, **ENGINE_OPTIONS)
+    try:
+        store = precompute_answers(engine)
+    finally:
+        engine.close()
+
+    return save_answers(store, persist_directory)
@@ -5,61 +5,475 @@ Moteur RAG (Retrieval-Augmented Generation)
 Gère la recherche et la génération de réponses
 """
 
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 from typing import List, Dict, Any
+import contextvars
+import copy
 import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.cache import LRUCache, TTLCache, normalize_query
+from src.embeddings import get_embedding_backend
+from src.vector_index import build_index, cosine_similarities
+from src.lexical import load_or_build, reciprocal_rank_fusion
+from src.filters import MetadataIndex, filters_key
+from src.site_router import SiteRouter, normalize_name
+from src.rerank import CrossEncoderReranker
+from src.diversify import mmr_select
+from src.generators import get_generator
+from src.context_packer import ContextPacker
+from src.precompute import answer_key, load_answers
+from src.instrumentation import StageHistograms, StageTimer
+from src.metrics import MetricsRegistry, MetricsServer
+from src.tracing import current_span, get_tracer
+from src.scheduler import MicroBatchScheduler, SingleFlight
+
+# Modes de recherche : vectorielle, lexicale (BM25) ou hybride (fusion RRF)
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Étapes de premier niveau d'une requête (les sous-étapes de la recherche sont comprises dans search_ms)
+QUERY_STAGES = ("cache_ms", "search_ms", "generate_ms")
 
 class RAGEngine:
     """Moteur RAG pour la recherche et génération de réponses"""
     
-    def __init__(self, chroma_path="data/chroma_db"):
-        """Initialise le moteur RAG avec ChromaDB"""
+    def __init__(self, chroma_path="data/chroma_db", embedding_cache_size=1024,
+                 response_cache_size=256, response_cache_ttl=3600.0, fingerprint_refresh=5.0,
+                 batch_window_ms=None, max_batch=32, lazy=False, embedding_backend=None,
+                 search_backend="chroma", hybrid_candidates=20, rrf_k=60,
+                 route_sites=True, rerank_candidates=20, rerank_budget_ms=200.0,
+                 mmr_candidates=20, mmr_lambda=0.5, generator=None, context_budget_chars=None,
+                 context_budget_tokens=None):
+        """Initialise le moteur RAG avec ChromaDB
+        
+        Avec lazy=True, le modèle et la collection sont chargés dans un thread
+        de fond : le constructeur rend la main immédiatement et `is_ready` /
+        `wait_until_ready()` indiquent quand le moteur peut répondre.
+        
+        `embedding_cache_size` ou `response_cache_size` à 0 désactivent ces caches.
+        
+        `embedding_backend` ("torch", "onnx-int8" ou une instance) doit être le
+        même que celui utilisé à l'ingestion (défaut : RAG_EMBEDDING_BACKEND).
+        
+        `search_backend` : "chroma" (HNSW) ou "numpy" (recherche exacte en mémoire,
+        plus rapide pour les petits et moyens corpus).
+        
+        En mode "hybrid", `hybrid_candidates` résultats sont pris de chaque
+        recherche (vectorielle et BM25) avant la fusion par rang réciproque.
+        
+        Avec `route_sites`, `query` restreint automatiquement la recherche aux
+        sites nommés dans la question ; sauf mode explicite, une question réduite
+        à un nom de site est traitée en recherche lexicale.
+        
+        Avec `rerank=True`, `rerank_candidates` candidats sont re-scorés par un
+        cross-encoder dans la limite de `rerank_budget_ms` millisecondes.
+        
+        Avec `mmr=True`, k résultats diversifiés sont choisis parmi `mmr_candidates`
+        (pertinence marginale maximale, compromis `mmr_lambda`).
+        
+        `generator` : "extractive" (défaut), "llama-cpp" ou une instance de
+        `Generator` (défaut : variable RAG_GENERATOR).
+        
+        Avec `context_budget_chars` et/ou `context_budget_tokens`, le contexte
+        transmis au générateur est réduit à ses meilleures phrases non redondantes
+        dans ce budget de caractères et/ou de tokens (tokenizer du générateur).
+        """
         self.chroma_path = chroma_path
+        self.embedding_backend = embedding_backend
+        self.search_backend = search_backend
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.route_sites = route_sites
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.mmr_candidates = mmr_candidates
+        self.mmr_lambda = mmr_lambda
+        self.generator_spec = generator
+        self.context_budget_chars = context_budget_chars
+        self.context_budget_tokens = context_budget_tokens
         
-        # Initialiser ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=chroma_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # État de chargement : "pending", "loading", "ready" ou "error"
+        self.state = "pending"
+        self.load_error = None
+        self.load_time = None
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        self.client = None
+        self.embedding_func = None
+        self.collection = None
+        self.index = None
+        self.generator = None
+        self.context_packer = None
+        self.lexical = None
+        self.metadata_index = None
+        self.site_router = None
+        self.site_embeddings = {}
+        self.reranker = None
+        self.precomputed = None
+        self._precomputed_fingerprint = None
+        self._index_lock = threading.Lock()
+        self._reranker_lock = threading.Lock()
         
-        # Fonction d'embedding
-        self.embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Cache LRU des embeddings de requêtes (clé : question normalisée)
+        self.embedding_cache = LRUCache(maxsize=embedding_cache_size)
         
-        # Charger la collection
-        self.collection = self.client.get_collection(
-            name="sites_archeologiques_tunisie",
-            embedding_function=self.embedding_func
-        )
+        # Cache des réponses complètes (clé : question normalisée, k, empreinte de la collection)
+        self.response_cache = TTLCache(maxsize=response_cache_size, ttl=response_cache_ttl)
+        self.fingerprint_refresh = fingerprint_refresh
+        self._fingerprint = None
+        self._fingerprint_checked_at = 0.0
+        self._fingerprint_lock = threading.Lock()
+        
+        # Histogrammes de latence par étape (p50/p95/p99)
+        self.latency = StageHistograms()
+        
+        # Déduplication des requêtes identiques en cours de calcul
+        self._inflight = SingleFlight()
+        
+        # Traces des requêtes (désactivées par défaut, voir RAG_TRACE_SAMPLE)
+        self.tracer = get_tracer()
         
-        print(f"✅ Moteur RAG initialisé - {self.collection.count()} documents")
+        # Registre de métriques (export Prometheus et instantané JSON)
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+        
+        # Micro-lots : regroupe les recherches concurrentes (désactivé par défaut)
+        self.scheduler = None
+        if batch_window_ms is not None:
+            self.scheduler = MicroBatchScheduler(
+                self.search_many,
+                max_batch=max_batch,
+                max_wait_ms=batch_window_ms
+            )
+        
+        if lazy:
+            self.start_loading()
+        else:
+            self.load()
+    
+    def load(self):
+        """Charge ChromaDB, le modèle d'embedding et la collection (bloquant)"""
+        with self._load_lock:
+            if self.state == "ready":
+                return
+            self.state = "loading"
+            start = time.perf_counter()
+            
+            try:
+                # Imports lourds différés : ne ralentissent pas l'import du module
+                import chromadb
+                from chromadb.config import Settings
+                
+                # Initialiser ChromaDB
+                self.client = chromadb.PersistentClient(
+                    path=self.chroma_path,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+                
+                # Fonction d'embedding
+                self.embedding_func = get_embedding_backend(self.embedding_backend)
+                
+                # Charger la collection
+                self.collection = self.client.get_collection(
+                    name="sites_archeologiques_tunisie",
+                    embedding_function=self.embedding_func
+                )
+                
+                indexed_with = (self.collection.metadata or {}).get("embedding_backend")
+                if indexed_with and indexed_with != self.embedding_func.name:
+                    print(f"⚠️ Collection indexée avec '{indexed_with}', requêtes avec '{self.embedding_func.name}'")
+                
+                # Index de recherche (ChromaDB ou matrice NumPy en mémoire)
+                self.index = build_index(self.search_backend, self.collection)
+                
+                # Empreinte de la collection indexée : pas de reconstruction à la première requête
+                self._fingerprint = self._fingerprint_of(self.collection)
+                self._fingerprint_checked_at = time.monotonic()
+                
+                # Générateur de réponses
+                self.generator = get_generator(self.generator_spec)
+                
+                # Compression extractive du contexte (optionnelle)
+                if self.context_budget_chars or self.context_budget_tokens:
+                    self.context_packer = ContextPacker(
+                        self.embedding_func,
+                        budget_chars=self.context_budget_chars or sys.maxsize,
+                        budget_tokens=self.context_budget_tokens,
+                        count_tokens=self.generator.count_tokens
+                    )
+            except Exception as e:
+                self.state = "error"
+                self.load_error = e
+                self._ready.set()
+                raise
+            
+            self.load_time = time.perf_counter() - start
+            self.state = "ready"
+            self._ready.set()
+        
+        print(f"✅ Moteur RAG initialisé - {self.collection.count()} documents ({self.load_time:.1f}s)")
     
-    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+    def start_loading(self) -> threading.Thread:
+        """Lance le chargement dans un thread de fond"""
+        def target():
+            try:
+                self.load()
+            except Exception as e:
+                print(f"❌ Erreur d'initialisation RAG: {e}")
+        
+        thread = threading.Thread(target=target, name="rag-loader", daemon=True)
+        thread.start()
+        return thread
+    
+    @property
+    def is_ready(self) -> bool:
+        """Indique si le moteur est chargé et prêt à répondre"""
+        return self.state == "ready"
+    
+    def wait_until_ready(self, timeout=None) -> bool:
+        """Attend la fin du chargement ; lève l'erreur de chargement éventuelle"""
+        if self.state == "pending":
+            self.load()
+        
+        if not self._ready.wait(timeout):
+            return False
+        
+        if self.state == "error":
+            raise RuntimeError(f"Échec du chargement du moteur RAG: {self.load_error}") from self.load_error
+        
+        return True
+    
+    def search(self, query: str, k: int = 3, mode: str = "vector",
+               filters: Dict[str, Any] = None, rerank: bool = False, mmr: bool = False) -> List[Dict[str, Any]]:
         """Recherche les documents les plus pertinents"""
+        return self.search_many([query], k=k, mode=mode, filters=filters, rerank=rerank, mmr=mmr)[0]
+    
+    def search_many(self, questions: List[str], k: int = 3, mode: str = "vector",
+                    filters: Dict[str, Any] = None, rerank: bool = False, mmr: bool = False,
+                    timings: Dict[str, float] = None) -> List[List[Dict[str, Any]]]:
+        """Recherche en lot : un seul passage d'embedding et une seule requête ChromaDB
+        
+        `mode` : "vector", "lexical" (BM25, sans embedding) ou "hybrid" (fusion RRF).
+        `filters` : filtre de métadonnées appliqué avant la recherche, par exemple
+        {"site": ["Dougga"], "type": "guide_officiel", "date": {"gte": "2020"}}.
+        `rerank` : re-classe `rerank_candidates` candidats avec le cross-encoder.
+        `mmr` : diversifie les k résultats parmi `mmr_candidates` candidats.
+        Si `timings` est fourni, il reçoit la durée (ms) de chaque étape.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Mode de recherche inconnu: {mode} (disponibles: {', '.join(SEARCH_MODES)})")
+        if not questions:
+            return []
+        
+        self.wait_until_ready()
+        timings = timings if timings is not None else {}
+        
+        with self.tracer.span("RAGEngine.search_many", batch_size=len(questions), k=k, mode=mode,
+                              filtered=bool(filters), rerank=rerank, mmr=mmr):
+            # Pré-filtrage par métadonnées (index par champ)
+            where, ids = None, None
+            if filters:
+                start = time.perf_counter()
+                with self.tracer.span("filters.resolve") as span:
+                    resolved = self._metadata_index().resolve(filters)
+                    where, ids = resolved.where, resolved.ids
+                    span.set_attribute("candidates", len(ids) if ids is not None else -1)
+                timings["filter_ms"] = (time.perf_counter() - start) * 1000
+                if not ids:
+                    return [[] for _ in questions]
+            
+            # Premier étage : plus de candidats si un re-classement ou une diversification suit
+            stage_k = max(k, self.mmr_candidates) if mmr else k
+            first_k = max(stage_k, self.rerank_candidates) if rerank else stage_k
+            candidates = self._retrieve(questions, first_k, mode, where, ids, timings)
+            
+            # Second étage : cross-encoder (repli sur l'ordre initial si budget dépassé)
+            if rerank:
+                start = time.perf_counter()
+                with self.tracer.span("rerank", candidates=first_k):
+                    reranker = self._reranker()
+                    candidates = [reranker.rerank(q, c, k=stage_k)[0] for q, c in zip(questions, candidates)]
+                timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+            
+            # Diversification MMR
+            if mmr:
+                start = time.perf_counter()
+                with self.tracer.span("mmr", candidates=stage_k):
+                    candidates = self._diversify(questions, candidates, k)
+                timings["mmr_ms"] = (time.perf_counter() - start) * 1000
+            
+            return candidates
+    
+    def _diversify(self, questions: List[str], candidates: List[List[Dict]], k: int) -> List[List[Dict[str, Any]]]:
+        """Sélection MMR des k résultats de chaque question"""
+        query_embeddings = self._embed_queries(questions)
+        
+        diversified = []
+        for query_embedding, results in zip(query_embeddings, candidates):
+            if len(results) <= k:
+                diversified.append(results)
+                continue
+            
+            embeddings = self.index.embeddings([r['chunk_id'] for r in results])
+            selected = mmr_select(query_embedding, embeddings, k=k, lambda_mult=self.mmr_lambda)
+            diversified.append([dict(results[i], id=rank) for rank, i in enumerate(selected)])
+        
+        return diversified
+    
+    def _retrieve(self, questions: List[str], k: int, mode: str, where, ids,
+                  timings: Dict[str, float]) -> List[List[Dict[str, Any]]]:
+        """Premier étage de recherche : vectorielle, lexicale ou hybride"""
+        depth = max(k, self.hybrid_candidates) if mode == "hybrid" else k
+        
+        if mode in ("vector", "hybrid"):
+            # Embedding de toutes les questions en un seul lot (avec cache)
+            start = time.perf_counter()
+            with self.tracer.span("embedding", backend=self.embedding_func.name, questions=len(questions)):
+                query_embeddings = self._embed_queries(questions)
+            timings["embedding_ms"] = (time.perf_counter() - start) * 1000
+            
+            # Recherche dans l'index (ChromaDB ou NumPy)
+            start = time.perf_counter()
+            with self.tracer.span("collection.query", backend=self.index.name, n_results=depth):
+                results = self.index.query(query_embeddings, k=depth, where=where, ids=ids)
+            vector_results = [self._format_results(results, i) for i in range(len(questions))]
+            timings["vector_ms"] = (time.perf_counter() - start) * 1000
+            
+            if mode == "vector":
+                return vector_results
+        
+        # Recherche lexicale BM25
+        start = time.perf_counter()
+        with self.tracer.span("bm25.query", n_results=depth):
+            results = self._lexical_index().query(questions, k=depth, ids=ids)
+        lexical_results = [self._format_results(results, i) for i in range(len(questions))]
+        timings["lexical_ms"] = (time.perf_counter() - start) * 1000
         
-        # Recherche dans ChromaDB
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=k,
-            include=["documents", "metadatas", "distances"]
+        if mode == "lexical":
+            return lexical_results
+        
+        # Fusion par rang réciproque
+        start = time.perf_counter()
+        fused = [self._fuse(v, l, k) for v, l in zip(vector_results, lexical_results)]
+        timings["fusion_ms"] = (time.perf_counter() - start) * 1000
+        
+        return fused
+    
+    def hybrid_search(self, query: str, k: int = 3, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Recherche hybride avec la durée de chaque recherche (ms)"""
+        timings = {}
+        results = self.search_many([query], k=k, mode="hybrid", filters=filters, timings=timings)[0]
+        return {
+            "results": results,
+            "timings": {name: round(value, 3) for name, value in timings.items()}
+        }
+    
+    def _fuse(self, vector_results: List[Dict], lexical_results: List[Dict], k: int) -> List[Dict[str, Any]]:
+        """Fusionne les résultats vectoriels et lexicaux d'une question (RRF)"""
+        ranking = reciprocal_rank_fusion(
+            [[r['chunk_id'] for r in vector_results], [r['chunk_id'] for r in lexical_results]],
+            rrf_k=self.rrf_k
         )
         
-        # Formater les résultats
+        # Les scores de similarité vectoriels priment sur les scores BM25 relatifs
+        by_id = {r['chunk_id']: r for r in lexical_results}
+        by_id.update({r['chunk_id']: r for r in vector_results})
+        
+        return [
+            dict(by_id[chunk_id], id=rank, rrf_score=round(score, 5))
+            for rank, (chunk_id, score) in enumerate(ranking[:k])
+        ]
+    
+    def _lexical_index(self):
+        """Index BM25 (chargé depuis l'ingestion, ou reconstruit depuis la collection)"""
+        with self._index_lock:
+            if self.lexical is None:
+                self.lexical = load_or_build(self.collection, self.chroma_path)
+            return self.lexical
+    
+    def _metadata_index(self) -> MetadataIndex:
+        """Index des métadonnées par champ (site, source, type, date)"""
+        with self._index_lock:
+            if self.metadata_index is None:
+                self.metadata_index = MetadataIndex.from_collection(self.collection)
+            return self.metadata_index
+    
+    def _site_router(self) -> SiteRouter:
+        """Reconnaissance des sites, alimentée par les sites présents dans la collection
+        
+        Les embeddings des noms et alias de sites sont calculés en un seul passage du
+        modèle à la construction du routeur : une question réduite à un nom de site
+        n'est jamais encodée à la requête.
+        """
+        sites = self._metadata_index().values("site")
+        with self._index_lock:
+            if self.site_router is None:
+                router = SiteRouter.from_sites(sites)
+                names = list(router.aliases)
+                self.site_embeddings = dict(zip(names, self.embedding_func(names))) if names else {}
+                self.site_router = router
+            return self.site_router
+    
+    def _reranker(self) -> CrossEncoderReranker:
+        """Cross-encoder, chargé à la première utilisation"""
+        with self._reranker_lock:
+            if self.reranker is None:
+                self.reranker = CrossEncoderReranker(budget_ms=self.rerank_budget_ms)
+            return self.reranker
+    
+    def route(self, question: str, mode: str = None):
+        """Déduit (filtres, mode) des sites mentionnés dans la question (mode None : automatique)"""
+        router = self._site_router()
+        sites = router.detect(question)
+        if not sites:
+            return None, mode
+        
+        # Question réduite à un nom de site, sans mode imposé : BM25 dans ce site
+        if mode is None and router.exact_site(question):
+            mode = "lexical"
+        
+        return {"site": sites}, mode
+    
+    def _embed_queries(self, questions: List[str]) -> List[List[float]]:
+        """Calcule les embeddings des questions, en ne passant au modèle que les absentes du cache"""
+        keys = [normalize_query(q) for q in questions]
+        embeddings = [self.embedding_cache.get(key) for key in keys]
+        
+        # Noms de sites (sans accents ni casse) : embeddings calculés avec le routeur
+        embeddings = [self.site_embeddings.get(normalize_name(q)) if emb is None else emb
+                      for q, emb in zip(questions, embeddings)]
+        
+        # Questions absentes du cache (dédupliquées) : un seul passage du modèle
+        missing = list(dict.fromkeys(key for key, emb in zip(keys, embeddings) if emb is None))
+        if missing:
+            computed = dict(zip(missing, self.embedding_func(missing)))
+            for key, emb in computed.items():
+                self.embedding_cache.put(key, emb)
+            embeddings = [computed.get(key, emb) for key, emb in zip(keys, embeddings)]
+        
+        return embeddings
+    
+    def _format_results(self, results: Dict[str, Any], index: int = 0) -> List[Dict[str, Any]]:
+        """Formate les résultats ChromaDB d'une question du lot"""
         formatted_results = []
         if results['documents']:
-            for i, (doc, metadata, distance) in enumerate(zip(
-                results['documents'][0],
-                results['metadatas'][0],
-                results['distances'][0]
+            for i, (chunk_id, doc, metadata, distance) in enumerate(zip(
+                results['ids'][index],
+                results['documents'][index],
+                results['metadatas'][index],
+                results['distances'][index]
             )):
                 # Convertir distance en score de similarité
                 similarity_score = 1 - distance
                 
                 formatted_results.append({
                     'id': i,
+                    'chunk_id': chunk_id,
                     'content': doc,
                     'metadata': metadata,
                     'similarity_score': round(similarity_score, 3),
@@ -78,13 +492,21 @@ class RAGEngine:
                 "confidence": 0.0
             }
         
-        # Construire le contexte
-        context_parts = []
+        header = self._response_header(context_results)
+        answer = "".join(self.generate_response_stream(query, context_results))
+        
+        return {
+            "answer": answer,
+            "sources": header['sources'],
+            "confidence": header['confidence'],
+            "context_results": header['context_results']
+        }
+    
+    def _response_header(self, context_results: List[Dict]) -> Dict[str, Any]:
+        """Sources et confiance d'une réponse (connues avant la génération du texte)"""
         sources = []
         
         for result in context_results:
-            context_parts.append(result['content'])
-            
             # Extraire les sources
             meta = result['metadata']
             source_info = {
@@ -95,50 +517,412 @@ class RAGEngine:
             if source_info not in sources:
                 sources.append(source_info)
         
-        # Construire la réponse (version simplifiée)
-        context = "\n\n".join(context_parts)
-        
-        # Pour un vrai projet, on utiliserait un LLM ici
-        # Pour cette version, on retourne le contexte formaté
-        answer = f"D'après les informations disponibles :\n\n{context}"
-        
         # Score de confiance (moyenne des similarités)
         confidence = sum(r['similarity_score'] for r in context_results) / len(context_results)
         
         return {
-            "answer": answer,
             "sources": sources,
             "confidence": round(confidence, 3),
             "context_results": len(context_results)
         }
     
-    def query(self, question: str, k: int = 3) -> Dict[str, Any]:
-        """Traite une requête complète"""
+    def generate_response_stream(self, query: str, context_results: List[Dict]):
+        """Génère le texte de la réponse fragment par fragment (via le générateur configuré)"""
+        self.wait_until_ready()
+        
+        # Réduire le contexte à ses meilleures phrases (sources conservées)
+        if self.context_packer is not None:
+            query_embedding = self._embed_queries([query])[0]
+            context_results = self.context_packer.pack(query_embedding, context_results)
+        
+        yield from self.generator.stream(query, context_results)
+    
+    def collection_fingerprint(self):
+        """Retourne l'empreinte de la collection (relue au plus toutes les `fingerprint_refresh` s)"""
+        self.wait_until_ready()
+        
+        with self._fingerprint_lock:
+            now = time.monotonic()
+            if self._fingerprint is not None and now - self._fingerprint_checked_at < self.fingerprint_refresh:
+                return self._fingerprint
+            
+            # Relire la collection : l'ingestion la recrée avec un nouveau tampon de version
+            collection = self.client.get_collection(
+                name=self.collection.name,
+                embedding_function=self.embedding_func
+            )
+            fingerprint = self._fingerprint_of(collection)
+            
+            if fingerprint != self._fingerprint:
+                if self._fingerprint is not None:
+                    print("♻️ Collection modifiée - cache des réponses invalidé")
+                    self.response_cache.clear()
+                self.collection = collection
+                self.index = build_index(self.search_backend, collection)
+                with self._index_lock:
+                    self.lexical = None
+                    self.metadata_index = None
+                    self.site_router = None
+                self._fingerprint = fingerprint
+            
+            self._fingerprint_checked_at = now
+            return self._fingerprint
+    
+    @staticmethod
+    def _fingerprint_of(collection):
+        """Empreinte d'une collection : (identifiant, tampon de version, nombre de chunks)"""
+        metadata = collection.metadata or {}
+        return (str(collection.id), metadata.get("version"), collection.count())
+    
+    def _precomputed_answer(self, question: str, k: int, mode: str, filters: Dict[str, Any],
+                            rerank: bool, mmr: bool) -> Dict[str, Any]:
+        """Réponse pré-calculée à l'ingestion (recherche O(1)), ou None"""
+        fingerprint = self.collection_fingerprint()
+        
+        with self._index_lock:
+            # Recharger le fichier après chaque ingestion
+            if self.precomputed is None or self._precomputed_fingerprint != fingerprint:
+                store = load_answers(self.chroma_path) or {}
+                valid = (
+                    store.get("version") == fingerprint[1]
+                    and store.get("generator") == self.generator.name
+                    and store.get("context_budget_chars") == self.context_budget_chars
+                    and store.get("context_budget_tokens") == self.context_budget_tokens
+                )
+                self.precomputed = store.get("answers", {}) if valid else {}
+                self._precomputed_fingerprint = fingerprint
+            precomputed = self.precomputed
+        
+        entry = precomputed.get(answer_key(question, k, mode, filters, rerank, mmr))
+        return entry['response'] if entry else None
+    
+    def _cache_key(self, question: str, k: int, mode: str, filters: Dict[str, Any], rerank: bool, mmr: bool):
+        """Clé du cache des réponses"""
+        return (normalize_query(question), k, mode, filters_key(filters), rerank, mmr,
+                self.collection_fingerprint())
+    
+    def query(self, question: str, k: int = 3, mode: str = None,
+              filters: Dict[str, Any] = None, rerank: bool = False, mmr: bool = False) -> Dict[str, Any]:
+        """Traite une requête complète
+        
+        `mode` : None (automatique : vectoriel, ou lexical pour un nom de site seul)
+        ou l'un des modes de `search_many`.
+        La réponse contient `timings` : durée (ms) de chaque étape de la requête.
+        Chaque appelant reçoit sa propre copie de la réponse (partagée avec le cache
+        et les appels identiques simultanés) : la modifier est sans effet ailleurs.
+        """
         print(f"🔍 Recherche: {question}")
         
+        timer = StageTimer()
+        try:
+            with self.tracer.span("RAGEngine.query", question=question, k=k, mode=mode or "auto") as span, \
+                    timer.span("total_ms"):
+                response, source = self._query(question, k, mode, filters, rerank, mmr, timer)
+                span.set_attribute("source", source)
+        except Exception:
+            self._query_errors.inc()
+            raise
+        
+        self._queries.inc(source=source)
+        self.latency.record(timer.timings)
+        return dict(copy.deepcopy(response), timings=timer.rounded())
+    
+    def _query(self, question: str, k: int, mode: str, filters: Dict[str, Any],
+               rerank: bool, mmr: bool, timer: StageTimer):
+        """Réponse pré-calculée, en cache ou calculée (partagée entre appels identiques)
+        
+        Retourne (réponse, origine) : "precomputed", "cache", "computed" ou "shared".
+        """
+        # 0. Réponses pré-calculées, puis cache des réponses
+        with timer.span("cache_ms"), self.tracer.span("cache.lookup"):
+            precomputed = self._precomputed_answer(question, k, mode, filters, rerank, mmr)
+            if precomputed is not None:
+                return precomputed, "precomputed"
+            
+            cache_key = self._cache_key(question, k, mode, filters, rerank, mmr)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached, "cache"
+        
+        # 1-2. Calcul partagé entre les appels identiques simultanés
+        computed = []
+        
+        def compute():
+            response = self._answer(question, k, mode, filters, rerank, mmr, timer)
+            self.response_cache.put(cache_key, response)
+            computed.append(True)
+            return response
+        
+        response = self._inflight.do(cache_key, compute)
+        return response, "computed" if computed else "shared"
+    
+    def query_stream(self, question: str, k: int = 3, mode: str = None,
+                     filters: Dict[str, Any] = None, rerank: bool = False, mmr: bool = False):
+        """Traite une requête complète en flux
+        
+        Produit d'abord {"type": "sources", "sources", "confidence", "context_results"}
+        dès la fin de la recherche, puis des {"type": "answer", "text"} au fil de la
+        génération, et enfin {"type": "done", "response", "timings"} avec la réponse
+        complète et la durée (ms) des étapes, hors temps passé chez l'appelant.
+        """
+        print(f"🔍 Recherche (flux): {question}")
+        
+        # Le flux s'exécute dans son propre contexte : le span de la requête est le parent
+        # des étapes du moteur sans rester actif chez l'appelant entre deux événements
+        context = contextvars.copy_context()
+        span = context.run(self.tracer.span("RAGEngine.query", question=question, k=k,
+                                            mode=mode or "auto", stream=True).__enter__)
+        events = self._query_stream(question, k, mode, filters, rerank, mmr)
+        error = None
+        try:
+            while True:
+                event = context.run(next, events, None)
+                if event is None:
+                    break
+                yield event
+        except Exception as e:
+            error = e
+            self._query_errors.inc()
+            raise
+        finally:
+            context.run(events.close)
+            context.run(span.__exit__, type(error) if error else None, error, None)
+    
+    def _query_stream(self, question: str, k: int, mode: str, filters: Dict[str, Any],
+                      rerank: bool, mmr: bool):
+        """Événements du flux d'une requête (voir `query_stream`)"""
+        timer = StageTimer()
+        
+        # 0. Réponses pré-calculées ou en cache : tout est déjà disponible
+        with timer.span("cache_ms"), self.tracer.span("cache.lookup"):
+            response = self._precomputed_answer(question, k, mode, filters, rerank, mmr)
+            source = "precomputed"
+            cache_key = self._cache_key(question, k, mode, filters, rerank, mmr)
+            if response is None:
+                response = self.response_cache.get(cache_key)
+                source = "cache"
+        
+        if response is None:
+            # 1. Recherche
+            with timer.span("search_ms"):
+                results = self.retrieve(question, k, mode, filters, rerank, mmr, timer.timings)
+            
+            if results:
+                # 2. Sources d'abord, puis le texte au fil de la génération
+                header = self._response_header(results)
+                yield dict(header, type="sources")
+                
+                # La durée du span inclut la consommation du flux ; generate_ms, le seul générateur
+                parts = []
+                with self.tracer.span("generate", generator=self.generator.name,
+                                      context_results=len(results)) as span:
+                    fragments = self.generate_response_stream(question, results)
+                    while True:
+                        with timer.span("generate_ms"):
+                            fragment = next(fragments, None)
+                        if fragment is None:
+                            break
+                        parts.append(fragment)
+                        yield {"type": "answer", "text": fragment}
+                    span.set_attribute("generate_ms", round(timer.timings["generate_ms"], 3))
+                
+                # Le cache garde sa propre copie (les sources ont déjà été remises à l'appelant)
+                response = dict(header, answer="".join(parts))
+                self.response_cache.put(cache_key, copy.deepcopy(response))
+                yield self._done_event(response, timer, "computed")
+                return
+            
+            response = self.respond(question, results)
+            source = "computed"
+            self.response_cache.put(cache_key, response)
+        
+        yield from self._stream_response(response, timer, source)
+    
+    def _done_event(self, response: Dict[str, Any], timer: StageTimer, source: str) -> Dict[str, Any]:
+        """Dernier événement d'un flux (durées enregistrées dans les histogrammes)"""
+        timer.add("total_ms", sum(timer.timings.get(stage, 0.0) for stage in QUERY_STAGES))
+        span = current_span()
+        if span is not None:
+            span.set_attribute("source", source)
+        self._queries.inc(source=source)
+        self.latency.record(timer.timings)
+        return {"type": "done", "response": response, "timings": timer.rounded()}
+    
+    def _stream_response(self, response: Dict[str, Any], timer: StageTimer, source: str):
+        """Restitue une réponse déjà calculée sous forme d'événements de flux (copie propre à l'appelant)"""
+        response = copy.deepcopy(response)
+        yield {
+            "type": "sources",
+            "sources": response['sources'],
+            "confidence": response['confidence'],
+            "context_results": response.get('context_results', 0)
+        }
+        yield {"type": "answer", "text": response['answer']}
+        yield self._done_event(response, timer, source)
+    
+    def _empty_response(self) -> Dict[str, Any]:
+        """Réponse lorsqu'aucun résultat n'est trouvé"""
+        return {
+            "answer": "Aucune information pertinente trouvée.",
+            "sources": [],
+            "confidence": 0.0,
+            "context_results": 0
+        }
+    
+    def retrieve(self, question: str, k: int = 3, mode: str = None, filters: Dict[str, Any] = None,
+                 rerank: bool = False, mmr: bool = False,
+                 timings: Dict[str, float] = None) -> List[Dict[str, Any]]:
+        """Recherche des résultats servant de contexte à la réponse (même chemin que `query`)
+        
+        Routage par nom de site (sans filtres ni mode imposés), micro-lot si activé,
+        scores en similarité cosinus quel que soit le mode. Si `timings` est fourni,
+        il reçoit la durée (ms) de chaque étape de la recherche.
+        """
+        # Sites mentionnés : restreindre la recherche
+        if self.route_sites and not filters:
+            filters, mode = self.route(question, mode)
+        mode = mode or "vector"
+        
+        # Recherche (via le micro-lot si activé, regroupée avec les questions de mêmes options)
+        if self.scheduler is not None:
+            # Le lot s'exécute dans le contexte du premier appelant (spans d'étapes sous le sien) ;
+            # chaque appelant reçoit les durées des étapes du lot et son attente dans la file
+            stages = {}
+            with self.tracer.span("scheduler.search", k=k, mode=mode, filtered=bool(filters)) as span:
+                results = self.scheduler.search(question, k=k, mode=mode, filters=filters,
+                                                rerank=rerank, mmr=mmr, timings=stages)
+                span.set_attributes({name: round(value, 3) for name, value in stages.items()})
+            if timings is not None:
+                timings.update(stages)
+        else:
+            results = self.search_many([question], k=k, mode=mode, filters=filters,
+                                       rerank=rerank, mmr=mmr, timings=timings)[0]
+        
+        # Scores BM25 relatifs (1.0 pour le meilleur chunk) : confiance affichée en similarité cosinus
+        if mode != "vector":
+            results = self._cosine_scores(question, results)
+        
+        return results
+    
+    def _cosine_scores(self, question: str, results: List[Dict]) -> List[Dict[str, Any]]:
+        """Remplace les scores des résultats par leur similarité cosinus avec la question"""
+        if not results:
+            return results
+        
+        query_embedding = self._embed_queries([question])[0]
+        embeddings = self.index.embeddings([r['chunk_id'] for r in results])
+        similarities = cosine_similarities(query_embedding, embeddings)
+        return [
+            dict(result, similarity_score=round(float(score), 3), distance=round(1 - float(score), 3))
+            for result, score in zip(results, similarities)
+        ]
+    
+    def respond(self, question: str, results: List[Dict]) -> Dict[str, Any]:
+        """Réponse générée à partir des résultats de `retrieve` (réponse vide s'il n'y en a aucun)"""
+        if results:
+            return self.generate_response(question, results)
+        
+        return self._empty_response()
+    
+    def _answer(self, question: str, k: int, mode: str = None, filters: Dict[str, Any] = None,
+                rerank: bool = False, mmr: bool = False, timer: StageTimer = None) -> Dict[str, Any]:
+        """Recherche puis génération de la réponse (sans cache)"""
+        timer = timer if timer is not None else StageTimer()
+        
         # 1. Recherche
-        results = self.search(question, k=k)
+        with timer.span("search_ms"):
+            results = self.retrieve(question, k, mode, filters, rerank, mmr, timer.timings)
         
         # 2. Génération de réponse
-        if results:
-            response = self.generate_response(question, results)
-        else:
-            response = {
-                "answer": "Aucune information pertinente trouvée.",
-                "sources": [],
-                "confidence": 0.0,
-                "context_results": 0
-            }
+        with timer.span("generate_ms"), self.tracer.span("generate", generator=self.generator.name,
+                                                         context_results=len(results)):
+            return self.respond(question, results)
+    
+    def query_many(self, questions: List[str], k: int = 3, mode: str = "vector",
+                   filters: Dict[str, Any] = None, rerank: bool = False,
+                   mmr: bool = False) -> List[Dict[str, Any]]:
+        """Traite un lot de requêtes complètes (évaluations, FAQ en masse)"""
+        print(f"🔍 Recherche en lot: {len(questions)} question(s)")
         
-        return response
+        results = self.search_many(questions, k=k, mode=mode, filters=filters, rerank=rerank, mmr=mmr)
+        return [self.respond(question, question_results) for question, question_results in zip(questions, results)]
     
     def get_collection_info(self) -> Dict[str, Any]:
         """Retourne des informations sur la collection"""
+        self.wait_until_ready()
+        
         return {
             "name": self.collection.name,
             "count": self.collection.count(),
-            "metadata": self.collection.metadata
+            "metadata": self.collection.metadata,
+            "search_backend": self.index.name,
+            "generator": self.generator.name,
+            "embedding_cache": self.embedding_cache.stats(),
+            "response_cache": self.response_cache.stats(),
+            "scheduler": self.scheduler.stats() if self.scheduler is not None else None,
+            "single_flight": self._inflight.stats(),
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+            "precomputed_answers": len(self.precomputed or {}),
+            "latency": self.latency_summary()
+        }
+    
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles de latence (ms) par étape depuis le démarrage"""
+        return self.latency.summary()
+    
+    def serve_metrics(self, host: str = "127.0.0.1", port: int = 9108) -> MetricsServer:
+        """Expose les métriques en HTTP local (/metrics au format Prometheus, /metrics.json)"""
+        return MetricsServer(self.metrics, host=host, port=port)
+    
+    def _cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques de tous les caches du moteur"""
+        stats = {
+            "embedding": self.embedding_cache.stats(),
+            "response": self.response_cache.stats()
         }
+        if self.context_packer is not None:
+            stats["sentence"] = self.context_packer.cache.stats()
+        if self.reranker is not None:
+            stats["rerank"] = self.reranker.cache.stats()
+        return stats
+    
+    def _register_metrics(self):
+        """Déclare les métriques du moteur (les valeurs d'état sont lues à chaque collecte)"""
+        metrics = self.metrics
+        self._queries = metrics.counter(
+            "rag_queries_total", "Requêtes traitées, par origine de la réponse", ("source",))
+        self._query_errors = metrics.counter(
+            "rag_query_errors_total", "Requêtes terminées en erreur")
+        metrics.histogram(
+            "rag_stage_duration_ms", "Durée des étapes d'une requête (ms)", "stage",
+            histograms=self.latency)
+        
+        metrics.counter("rag_cache_hits_total", "Succès des caches", ("cache",),
+                        func=lambda: {name: s["hits"] for name, s in self._cache_stats().items()})
+        metrics.counter("rag_cache_misses_total", "Échecs des caches", ("cache",),
+                        func=lambda: {name: s["misses"] for name, s in self._cache_stats().items()})
+        metrics.gauge("rag_cache_hit_ratio", "Taux de succès des caches depuis le démarrage", ("cache",),
+                      func=lambda: {name: s["hit_ratio"] for name, s in self._cache_stats().items()})
+        metrics.gauge("rag_cache_entries", "Entrées présentes dans les caches", ("cache",),
+                      func=lambda: {name: s["size"] for name, s in self._cache_stats().items()})
+        
+        metrics.gauge("rag_ready", "Moteur chargé et prêt à répondre (1) ou non (0)",
+                      func=lambda: 1.0 if self.is_ready else 0.0)
+        metrics.gauge("rag_model_load_seconds", "Durée du chargement du moteur (ChromaDB, modèles, index)",
+                      func=lambda: self.load_time)
+        metrics.gauge("rag_collection_documents", "Nombre de chunks dans la collection",
+                      func=lambda: self.collection.count() if self.is_ready else None)
+        metrics.gauge("rag_precomputed_answers", "Réponses pré-calculées chargées",
+                      func=lambda: len(self.precomputed or {}))
+        metrics.gauge("rag_scheduler_pending", "Recherches en attente de micro-lot",
+                      func=lambda: self.scheduler.stats()["pending"] if self.scheduler is not None else None)
+        metrics.counter("rag_single_flight_shared_total", "Requêtes servies par un calcul identique en cours",
+                        func=lambda: self._inflight.stats()["shared"])
+    
+    def close(self):
+        """Libère les ressources du moteur (thread de micro-lots)"""
+        if self.scheduler is not None:
+            self.scheduler.close()
 
 
 # Interface en ligne de commande
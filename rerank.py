@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Re-classement des résultats par cross-encoder
+Second étage optionnel : re-score des paires (question, chunk) par lots, avec cache et budget de latence
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.cache import LRUCache, normalize_query
+
+# Cross-encoder multilingue compact (le corpus est en français)
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    """Re-classe les candidats du premier étage avec un cross-encoder CPU
+
+    Les scores des paires déjà vues sont servis par un cache LRU. Un lot
+    n'est lancé que si le coût mesuré par paire (lots précédents) laisse
+    prévoir qu'il tiendra dans le budget restant ; sinon l'ordre du premier
+    étage est conservé, sans dépasser le budget d'un lot entier.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 16,
+                 budget_ms: float = 200.0, cache_size: int = 4096, device: str = "cpu"):
+        """Charge le cross-encoder"""
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.model = CrossEncoder(model_name, device=device)
+        self.cache = LRUCache(maxsize=cache_size)
+
+        # Coût moyen d'une paire (s), mesuré sur les lots précédents
+        self.pair_cost = None
+
+        # Statistiques
+        self.reranked = 0
+        self.fallbacks = 0
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], k: int = 3) -> Tuple[List[Dict[str, Any]], bool]:
+        """Retourne (top-k re-classé, True) ou (top-k du premier étage, False) si le budget est dépassé"""
+        if not candidates:
+            return [], True
+
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        key = normalize_query(query)
+
+        # Scores déjà en cache
+        scores = {}
+        pending = []
+        for candidate in candidates:
+            score = self.cache.get((key, candidate['chunk_id']))
+            if score is None:
+                pending.append(candidate)
+            else:
+                scores[candidate['chunk_id']] = score
+
+        # Scores manquants, par lots, tant que le lot suivant tient dans le budget restant
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            batch_start = time.perf_counter()
+            expected = len(batch) * self.pair_cost if self.pair_cost is not None else 0.0
+            if batch_start + expected >= deadline:
+                self.fallbacks += 1
+                return candidates[:k], False
+
+            batch_scores = self.model.predict(
+                [(query, candidate['content']) for candidate in batch],
+                batch_size=len(batch),
+                show_progress_bar=False
+            )
+            cost = (time.perf_counter() - batch_start) / len(batch)
+            # Moyenne glissante : suit la charge de la machine sans à-coups
+            self.pair_cost = cost if self.pair_cost is None else 0.8 * self.pair_cost + 0.2 * cost
+            for candidate, score in zip(batch, batch_scores):
+                scores[candidate['chunk_id']] = float(score)
+                self.cache.put((key, candidate['chunk_id']), float(score))
+
+        self.reranked += 1
+        ranked = sorted(candidates, key=lambda c: scores[c['chunk_id']], reverse=True)[:k]
+        return [
+            dict(candidate, id=rank, rerank_score=round(scores[candidate['chunk_id']], 4))
+            for rank, candidate in enumerate(ranked)
+        ], True
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du re-classement"""
+        return {
+            "model": self.model_name,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "budget_ms": self.budget_ms,
+            "pair_cost_ms": round(self.pair_cost * 1000, 3) if self.pair_cost is not None else None,
+            "cache": self.cache.stats()
+        }
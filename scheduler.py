@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ordonnanceur de requêtes pour le moteur RAG
+Regroupe les recherches concurrentes en micro-lots (un embedding, une requête ChromaDB)
+et déduplique les calculs identiques déjà en cours
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple
+import sys
+from pathlib import Path
+
+# Ajouter le chemin src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.filters import filters_key
+
+
+class _Pending(NamedTuple):
+    """Recherche déposée dans la file du micro-lot"""
+    query: str
+    options: Dict[str, Any]
+    future: Future
+    enqueued: float
+    context: contextvars.Context
+
+
+class MicroBatchScheduler:
+    """Regroupe les recherches arrivant dans une même fenêtre de temps
+
+    Chaque appel à `search` dépose la question dans une file ; un thread de
+    fond collecte les questions arrivées pendant `max_wait_ms` (ou jusqu'à
+    `max_batch` questions), appelle `search_many` une fois par groupe de
+    questions aux options identiques (k, mode, filtres, rerank, mmr) et
+    renvoie à chaque appelant sa part du résultat.
+
+    Le lot s'exécute dans le contexte (contextvars) du premier appelant du
+    groupe : ses spans d'étapes sont les enfants du span de cet appelant.
+    Chaque appelant reçoit les durées des étapes du lot et son attente dans
+    la file (`queue_wait_ms`).
+    """
+
+    def __init__(self, search_many: Callable[..., List[List[Dict[str, Any]]]],
+                 max_batch: int = 32, max_wait_ms: float = 5.0):
+        """Initialise l'ordonnanceur autour d'une fonction de recherche en lot"""
+        self._search_many = search_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._stopped = threading.Event()
+
+        # Statistiques
+        self.batches = 0
+        self.queries = 0
+
+        self._worker = threading.Thread(target=self._run, name="rag-microbatch", daemon=True)
+        self._worker.start()
+
+    def submit(self, query: str, k: int = 3, **options) -> Future:
+        """Dépose une recherche et retourne un Future sur (résultats, durées des étapes en ms)
+
+        `options` : mode, filters, rerank, mmr (transmis à `search_many`).
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("L'ordonnanceur est arrêté")
+
+        future: Future = Future()
+        self._queue.put(_Pending(query, dict(options, k=k), future, time.perf_counter(),
+                                 contextvars.copy_context()))
+        return future
+
+    def search(self, query: str, k: int = 3, timeout: float = None,
+               timings: Dict[str, float] = None, **options) -> List[Dict[str, Any]]:
+        """Recherche bloquante passant par le micro-lot
+
+        Si `timings` est fourni, il reçoit la durée (ms) des étapes du lot et `queue_wait_ms`.
+        """
+        results, stages = self.submit(query, k=k, **options).result(timeout=timeout)
+        if timings is not None:
+            timings.update(stages)
+        return results
+
+    @staticmethod
+    def _group_key(options: Dict[str, Any]) -> Hashable:
+        """Clé des requêtes pouvant partager un même appel à `search_many`"""
+        return (options["k"], options.get("mode", "vector"), filters_key(options.get("filters")),
+                bool(options.get("rerank")), bool(options.get("mmr")))
+
+    def _collect(self) -> List[_Pending]:
+        """Attend une première requête puis collecte les suivantes pendant la fenêtre"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        """Boucle du thread de fond"""
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Ignorer les requêtes annulées avant l'exécution
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Un appel à `search_many` par groupe d'options identiques
+            groups: Dict[Hashable, List[_Pending]] = {}
+            for item in batch:
+                groups.setdefault(self._group_key(item.options), []).append(item)
+
+            for group in groups.values():
+                self._run_group(group)
+
+    def _run_group(self, group: List[_Pending]) -> None:
+        """Exécute un lot de questions partageant les mêmes options"""
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        try:
+            results = group[0].context.run(self._search_many, [item.query for item in group],
+                                           timings=timings, **group[0].options)
+        except Exception as e:
+            for item in group:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(group, results):
+            stages = dict(timings, queue_wait_ms=(started - item.enqueued) * 1000)
+            item.future.set_result((result, stages))
+
+        self.batches += 1
+        self.queries += len(group)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques de regroupement"""
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Arrête le thread de fond après avoir servi les requêtes en attente"""
+        self._stopped.set()
+        self._worker.join(timeout=timeout)
+
+
+class SingleFlight:
+    """Partage un même calcul entre appels identiques simultanés
+
+    Le premier appelant pour une clé exécute la fonction ; les appelants
+    suivants arrivant pendant le calcul attendent et reçoivent le même
+    objet résultat (ou la même exception).
+    """
+
+    def __init__(self):
+        """Initialise la table des calculs en cours"""
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+
+        # Statistiques
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Exécute `func` une seule fois pour tous les appels concurrents de même clé"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques de déduplication"""
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "in_flight": len(self._inflight)
+            }
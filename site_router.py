@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconnaissance des noms de sites dans les questions
+Dictionnaire d'alias compilé en automate d'Aho-Corasick (sans accents ni casse)
+pour restreindre automatiquement la recherche aux sites mentionnés
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from src.lexical import fold
+
+# Alias connus, indexés par nom de site normalisé (cf. `normalize_name`)
+SITE_ALIASES = {
+    "carthage": ["carthago", "karthago", "qart hadasht", "byrsa"],
+    "dougga": ["thugga", "thougga", "tbgg"],
+    "el jem": ["eljem", "el djem", "el-djem", "thysdrus", "colisee d el jem", "amphitheatre d el jem"],
+    "kerkouane": ["kerkuane", "tamezrat"],
+    "sbeitla": ["sufetula", "sbitla", "subaytilah"],
+}
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(text: str) -> str:
+    """Sans accents, minuscules, ponctuation et '_' remplacés par des espaces"""
+    return " ".join(_NON_ALNUM_RE.sub(" ", fold(text)).split())
+
+
+class SiteRouter:
+    """Détecte les sites mentionnés dans un texte
+
+    Tous les alias sont compilés dans un unique automate d'Aho-Corasick : la
+    détection est linéaire en la longueur de la question, quel que soit le
+    nombre de sites et d'alias. Les correspondances sont limitées aux mots
+    entiers.
+    """
+
+    def __init__(self, aliases: Dict[str, str]):
+        """Compile l'automate à partir d'un dictionnaire alias -> site"""
+        self.aliases = {normalize_name(alias): site for alias, site in aliases.items() if normalize_name(alias)}
+
+        # Automate : transitions, liens d'échec, sorties (alias reconnus)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+
+        for alias in self.aliases:
+            self._add(f" {alias} ")
+        self._build_failure_links()
+
+    @classmethod
+    def from_sites(cls, sites: Iterable[str], extra_aliases: Dict[str, List[str]] = None) -> "SiteRouter":
+        """Construit le routeur à partir des noms de sites (métadonnées d'ingestion) et d'alias"""
+        extra_aliases = SITE_ALIASES if extra_aliases is None else extra_aliases
+
+        aliases = {}
+        for site in sites:
+            key = normalize_name(site)
+            aliases[key] = site
+            for alias in extra_aliases.get(key, []):
+                aliases[alias] = site
+
+        return cls(aliases)
+
+    def _add(self, pattern: str) -> None:
+        """Ajoute un motif au trie"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state].append(pattern.strip())
+
+    def _build_failure_links(self) -> None:
+        """Calcule les liens d'échec (parcours en largeur)"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def _matches(self, text: str) -> List[str]:
+        """Alias présents dans le texte (dans l'ordre d'apparition)"""
+        matches = []
+        state = 0
+        for char in f" {normalize_name(text)} ":
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            matches.extend(self._out[state])
+        return matches
+
+    def detect(self, text: str) -> List[str]:
+        """Sites mentionnés dans le texte (sans doublon, dans l'ordre d'apparition)"""
+        return list(dict.fromkeys(self.aliases[alias] for alias in self._matches(text)))
+
+    def exact_site(self, text: str) -> Optional[str]:
+        """Site désigné si le texte se réduit exactement à un nom ou alias de site"""
+        return self.aliases.get(normalize_name(text))
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Traces des requêtes du moteur RAG
+Spans hiérarchiques (gestionnaires de contexte) propagés par contextvars, avec un
+identifiant de requête, et exportateurs en mémoire (tampon circulaire) ou JSON lines
+au format OpenTelemetry (OTLP/JSON)
+
+Configuration : RAG_TRACE_SAMPLE (proportion de requêtes tracées, 0 par défaut)
+et RAG_TRACE_FILE (fichier JSON lines, optionnel).
+"""
+
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+# Span courant et identifiant de la requête en cours (propagés par contextvars)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("rag_current_span", default=None)
+_request_id: contextvars.ContextVar = contextvars.ContextVar("rag_request_id", default=None)
+
+
+def new_id(n_bytes: int = 16) -> str:
+    """Identifiant hexadécimal aléatoire (16 octets : trace, 8 octets : span)"""
+    return random.getrandbits(n_bytes * 8).to_bytes(n_bytes, "big").hex()
+
+
+def current_request_id() -> Optional[str]:
+    """Identifiant de la requête en cours (None hors requête)"""
+    return _request_id.get()
+
+
+def current_span() -> Optional["Span"]:
+    """Span actif dans le contexte courant (None si aucun)"""
+    span = _current_span.get()
+    return span if span is not None and span.recording else None
+
+
+class _NoopSpan:
+    """Span inactif : ne mesure rien et ne change pas le contexte (traçage désactivé)"""
+
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """Racine non échantillonnée : ses descendants ne sont pas tracés non plus"""
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        return False
+
+
+class Span:
+    """Étape mesurée d'une requête
+
+    Utilisé comme gestionnaire de contexte : il devient le span courant (parent
+    des spans ouverts dans le bloc) et est exporté à sa fermeture.
+    """
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"] = None,
+                 attributes: Dict[str, Any] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else new_id(16)
+        self.span_id = new_id(8)
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.request_id = parent.request_id if parent is not None else (current_request_id() or self.trace_id)
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = "OK"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Ajoute un attribut au span"""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Ajoute plusieurs attributs au span"""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        """Durée du span (ms)"""
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self):
+        self._span_token = _current_span.set(self)
+        self._request_token = _request_id.set(self.request_id) if self.parent_span_id is None else None
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = "ERROR"
+            self.status_message = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._span_token)
+        if self._request_token is not None:
+            _request_id.reset(self._request_token)
+        self.tracer._export(self)
+        return False
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Span au format OTLP/JSON (champ `spans` d'un scopeSpans)"""
+        attributes = dict(self.attributes, **{"rag.request_id": self.request_id})
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "ERROR" else "STATUS_CODE_OK"}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Résumé lisible du span (pour l'affichage)"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "request_id": self.request_id,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Valeur d'attribut OTLP/JSON (AnyValue)"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """Attribut OTLP/JSON (KeyValue)"""
+    return {"key": key, "value": _otlp_value(value)}
+
+
+class RingBufferExporter:
+    """Garde en mémoire les derniers spans terminés (capacité fixe)"""
+
+    def __init__(self, capacity: int = 2048):
+        self._spans = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Ajoute un span terminé"""
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        """Spans conservés, du plus ancien au plus récent"""
+        with self._lock:
+            return list(self._spans)
+
+    def traces(self) -> Dict[str, List[Span]]:
+        """Spans conservés regroupés par trace"""
+        traces: Dict[str, List[Span]] = {}
+        for span in self.spans():
+            traces.setdefault(span.trace_id, []).append(span)
+        return traces
+
+    def slowest(self, n: int = 10) -> List[List[Dict[str, Any]]]:
+        """Les n traces dont la racine est la plus lente, spans triés par début"""
+        traces = self.traces()
+        roots = sorted(
+            (span for spans in traces.values() for span in spans if span.parent_span_id is None),
+            key=lambda span: span.duration_ms,
+            reverse=True
+        )
+        return [
+            [span.to_dict() for span in sorted(traces[root.trace_id], key=lambda s: s.start_ns)]
+            for root in roots[:n]
+        ]
+
+    def clear(self) -> None:
+        """Vide le tampon"""
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonLinesExporter:
+    """Écrit chaque span terminé dans un fichier JSON lines (une ligne OTLP/JSON par span)
+
+    Chaque ligne est un objet {"resourceSpans": [...]}, comme celles du
+    « file exporter » du collecteur OpenTelemetry.
+    """
+
+    def __init__(self, path: str, service_name: str = "rag-tunisie"):
+        self.path = path
+        self.service_name = service_name
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Ajoute une ligne au fichier"""
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": [span.to_otlp()]}]
+            }]
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        """Ferme le fichier"""
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Crée les spans et les transmet aux exportateurs
+
+    La décision d'échantillonnage est prise à la racine de chaque trace
+    (`sample_ratio`) et héritée par ses descendants. Avec un taux nul, `span`
+    retourne un span inactif partagé : le coût se limite à un appel de méthode.
+    """
+
+    def __init__(self, sample_ratio: float = 0.0, exporters: Sequence[Any] = ()):
+        self.sample_ratio = sample_ratio
+        self.exporters = list(exporters)
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Traceur configuré par RAG_TRACE_SAMPLE et RAG_TRACE_FILE"""
+        tracer = cls()
+        tracer.configure(
+            sample_ratio=float(os.environ.get("RAG_TRACE_SAMPLE", "0") or 0),
+            path=os.environ.get("RAG_TRACE_FILE") or None
+        )
+        return tracer
+
+    def configure(self, sample_ratio: float = None, path: str = None, capacity: int = 2048) -> None:
+        """Change le taux d'échantillonnage ; ajoute le tampon mémoire (et le fichier JSON lines)"""
+        if sample_ratio is not None:
+            if not 0.0 <= sample_ratio <= 1.0:
+                raise ValueError(f"Taux d'échantillonnage invalide: {sample_ratio} (attendu entre 0 et 1)")
+            self.sample_ratio = sample_ratio
+        if self.sample_ratio > 0 and self.ring_buffer() is None:
+            self.exporters.append(RingBufferExporter(capacity))
+        if path:
+            self.exporters.append(JsonLinesExporter(path))
+
+    @property
+    def enabled(self) -> bool:
+        """Indique si des traces peuvent être produites"""
+        return self.sample_ratio > 0
+
+    def span(self, name: str, **attributes):
+        """Ouvre un span (enfant du span courant s'il existe) ; à utiliser avec `with`"""
+        if self.sample_ratio <= 0:
+            return NOOP_SPAN
+
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_ratio < 1.0 and random.random() >= self.sample_ratio:
+                return _UnsampledSpan()
+        elif not parent.recording:
+            return NOOP_SPAN
+
+        return Span(self, name, parent, attributes)
+
+    def ring_buffer(self) -> Optional[RingBufferExporter]:
+        """Exportateur en mémoire (None s'il n'est pas configuré)"""
+        for exporter in self.exporters:
+            if isinstance(exporter, RingBufferExporter):
+                return exporter
+        return None
+
+    def _export(self, span: Span) -> None:
+        """Transmet un span terminé aux exportateurs (une erreur d'export ne casse pas la requête)"""
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"⚠️ Export de trace en échec: {e}")
+
+    def close(self) -> None:
+        """Ferme les exportateurs fichiers"""
+        for exporter in self.exporters:
+            if hasattr(exporter, "close"):
+                exporter.close()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Traceur du processus (créé à la première utilisation depuis l'environnement)"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+
+def configure_tracing(sample_ratio: float = None, path: str = None, capacity: int = 2048) -> Tracer:
+    """Configure le traceur du processus (taux d'échantillonnage, fichier JSON lines)"""
+    tracer = get_tracer()
+    tracer.configure(sample_ratio=sample_ratio, path=path, capacity=capacity)
+    return tracer
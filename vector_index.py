@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index vectoriels interchangeables pour le moteur RAG
+ChromaDB (HNSW) ou recherche exacte en mémoire avec NumPy
+
+Les deux index exposent `query(query_embeddings, k, where=None, ids=None)`
+et retournent un dictionnaire au format de `collection.query` de ChromaDB
+(ids, documents, metadatas, distances en distance cosinus), un lot de
+questions à la fois. Le pré-filtrage utilise la clause `where` (ChromaDB) ou
+l'ensemble d'identifiants autorisés (NumPy).
+"""
+
+from typing import Any, Collection, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class ChromaIndex:
+    """Recherche approchée déléguée à ChromaDB (HNSW)"""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        """Initialise l'index autour d'une collection ChromaDB"""
+        self.collection = collection
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], k: int = 3,
+              where: Optional[Dict[str, Any]] = None, ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """Recherche les k plus proches voisins de chaque embedding"""
+        if ids is not None:
+            # Ne pas demander plus de résultats qu'il n'y a de chunks candidats
+            k = min(k, len(ids))
+        if k == 0:
+            empty = [[] for _ in query_embeddings]
+            return {"ids": empty, "documents": list(empty), "metadatas": list(empty), "distances": list(empty)}
+
+        return self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float64).tolist(),
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    def embeddings(self, ids: Sequence[str]) -> np.ndarray:
+        """Embeddings des chunks demandés (dans l'ordre de `ids`)"""
+        if not ids:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        data = self.collection.get(ids=list(ids), include=["embeddings"])
+        by_id = dict(zip(data["ids"], data["embeddings"]))
+        return np.array([by_id[i] for i in ids], dtype=np.float32)
+
+
+class NumpyIndex:
+    """Recherche exacte : une matrice float32 contiguë d'embeddings normalisés
+
+    Le top-k d'un lot de questions est obtenu par un seul produit matriciel
+    suivi d'un `argpartition`, sans passer par SQLite ni par le graphe HNSW.
+    Adapté aux corpus petits et moyens (jusqu'à quelques centaines de
+    milliers de chunks).
+    """
+
+    name = "numpy"
+
+    def __init__(self, ids: List[str], embeddings, documents: List[str] = None,
+                 metadatas: List[Dict[str, Any]] = None):
+        """Construit l'index à partir d'embeddings (normalisés à la construction)"""
+        matrix = np.array(embeddings, dtype=np.float32, order="C")
+        if matrix.ndim != 2:
+            raise ValueError("embeddings doit être une matrice (n, dim)")
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.clip(norms, 1e-12, None)
+
+        self.matrix = matrix
+        self.ids = list(ids)
+        self.documents = list(documents) if documents is not None else [None] * len(self.ids)
+        self.metadatas = list(metadatas) if metadatas is not None else [None] * len(self.ids)
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_collection(cls, collection) -> "NumpyIndex":
+        """Charge tous les embeddings d'une collection ChromaDB en mémoire"""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if not data["ids"]:
+            embeddings = np.zeros((0, 1), dtype=np.float32)
+
+        return cls(data["ids"], embeddings, data["documents"], data["metadatas"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def embeddings(self, ids: Sequence[str]) -> np.ndarray:
+        """Embeddings (normalisés) des chunks demandés, dans l'ordre de `ids`"""
+        return self.matrix[[self._positions[i] for i in ids]]
+
+    def rows(self, ids: Collection[str]) -> np.ndarray:
+        """Indices (triés) des lignes correspondant à des identifiants de chunks"""
+        return np.array(sorted(self._positions[i] for i in ids if i in self._positions), dtype=np.int64)
+
+    def top_k(self, query_embeddings, k: int = 3, rows: Optional[np.ndarray] = None):
+        """Retourne (indices, similarités) des k meilleurs chunks pour chaque question
+
+        Si `rows` est fourni, seules ces lignes de la matrice sont évaluées.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        n = len(matrix)
+        k = min(k, n)
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        scores = queries @ matrix.T
+
+        if k < n:
+            # Sélection partielle O(n), puis tri des seuls k candidats
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(n), (len(queries), n))
+
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        similarities = np.take_along_axis(candidate_scores, order, axis=1)
+
+        if rows is not None:
+            # Revenir aux indices de la matrice complète
+            indices = rows[indices]
+        return indices, similarities
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], k: int = 3,
+              where: Optional[Dict[str, Any]] = None, ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """Recherche les k plus proches voisins de chaque embedding (format ChromaDB)
+
+        Le pré-filtrage passe par `ids` ; `where` est accepté pour compatibilité
+        mais doit avoir été résolu en identifiants par l'appelant.
+        """
+        rows = self.rows(ids) if ids is not None else None
+        indices, similarities = self.top_k(query_embeddings, k, rows=rows)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row, sims in zip(indices, similarities):
+            results["ids"].append([self.ids[i] for i in row])
+            results["documents"].append([self.documents[i] for i in row])
+            results["metadatas"].append([self.metadatas[i] for i in row])
+            results["distances"].append([float(1.0 - s) for s in sims])
+
+        return results
+
+
+def cosine_similarities(query_embedding, embeddings) -> np.ndarray:
+    """Similarité cosinus entre une question et chaque ligne de `embeddings`"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix = matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    return matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+
+INDEXES = {
+    ChromaIndex.name: ChromaIndex,
+    NumpyIndex.name: NumpyIndex.from_collection,
+}
+
+
+def build_index(name: str, collection):
+    """Construit l'index de recherche demandé ("chroma" ou "numpy")"""
+    if name not in INDEXES:
+        raise ValueError(f"Index de recherche inconnu: {name} (disponibles: {', '.join(INDEXES)})")
+
+    return INDEXES[name](collection)